@@ -0,0 +1,243 @@
+#! python3
+"""Streams the events of games of Tetros to a file, for analytics.
+
+An Analytics object listens to one or more Games, which send it an event
+every time a Tetromino spawns or locks, rows are cleared, the level goes up
+or the game ends. Events are put in a bounded queue and written in batches
+by a background thread, either as newline-delimited JSON or as rows of a
+SQLite table:
+
+    {"time": 1760000000.1, "seed": 123, "type": "lock", "tick": 240,
+     "shape": "T", "rotation": 1, "left": 4, "top": 18}
+
+Recording an event never waits. If the writer falls so far behind that the
+queue is full, for example on a slow disk, the event is dropped and counted
+in dropped instead, so the game loop is never stalled.
+"""
+
+import functools
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from engine import Spawn, Lock, LineClear, LevelUp, GameOver
+
+
+QUEUE_SIZE = 10000
+BATCH_SIZE = 500
+FLUSH_INTERVAL = 1.0
+SQLITE_EXTENSIONS = (".db", ".sqlite", ".sqlite3")
+EVENT_TYPES = {
+    Spawn: "spawn",
+    Lock: "lock",
+    LineClear: "line_clear",
+    LevelUp: "level_up",
+    GameOver: "game_over",
+}
+
+
+class NdjsonWriter:
+    """Class used to append events to a file of newline-delimited JSON, one
+    object per event.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+
+    def write(self, records):
+        """Appends a batch of events to the file.
+
+        Args:
+            records (list): A dict for every event.
+        """
+        if self.file is None:
+            self.file = open(self.path, "a")
+        self.file.write("".join(json.dumps(record) + "\n"
+                                for record in records))
+        self.file.flush()
+
+    def close(self):
+        """Closes the file."""
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+class SqliteWriter:
+    """Class used to append events to the events table of a SQLite
+    database, with the time, seed, type and tick of each event in columns of
+    their own and the rest of it as JSON in the data column.
+
+    The connection is opened by the first write, so it belongs to the
+    thread writing the events, and must be closed by the same thread.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.connection = None
+
+    def write(self, records):
+        """Appends a batch of events to the table, in one transaction.
+
+        Args:
+            records (list): A dict for every event.
+        """
+        if self.connection is None:
+            self.connection = sqlite3.connect(self.path)
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS events (time REAL, seed INTEGER, "
+                "type TEXT, tick INTEGER, data TEXT)")
+        rows = []
+        for record in records:
+            data = dict(record)
+            rows.append((data.pop("time"), data.pop("seed"), data.pop("type"),
+                         data.pop("tick"), json.dumps(data)))
+        with self.connection:
+            self.connection.executemany(
+                "INSERT INTO events VALUES (?, ?, ?, ?, ?)", rows)
+
+    def close(self):
+        """Closes the database."""
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+def open_writer(path):
+    """Picks a writer for a file by its extension.
+
+    Args:
+        path (string): The file to write the events to. Files ending in
+            .db, .sqlite or .sqlite3 are written as SQLite, anything else
+            as newline-delimited JSON.
+
+    Returns:
+        NdjsonWriter or SqliteWriter: The writer.
+    """
+    if os.path.splitext(path)[1].lower() in SQLITE_EXTENSIONS:
+        return SqliteWriter(path)
+    return NdjsonWriter(path)
+
+
+def to_record(recorded_at, seed, event):
+    """Turns an event into a dict that can be written out.
+
+    Args:
+        recorded_at (float): When the event was recorded, in seconds since
+            the epoch.
+        seed (int): The seed of the game that sent it.
+        event (tuple): The event, one of the event namedtuples in
+            engine.py.
+
+    Returns:
+        dict: The time, seed and type of the event, and its fields.
+    """
+    record = {"time": recorded_at, "seed": seed,
+              "type": EVENT_TYPES[type(event)]}
+    record.update(event._asdict())
+    if "rows" in record:
+        record["rows"] = list(record["rows"])
+    return record
+
+
+class Analytics:
+    """Class used to record the events of games and write them out from a
+    background thread.
+
+    The writer thread writes a batch once batch_size events are waiting,
+    or flush_interval seconds after the oldest waiting event was recorded,
+    whichever comes first. The number of events written, dropped because
+    the queue was full, and lost because the writer failed are kept in
+    written, dropped and failed.
+    """
+
+    def __init__(self, writer, queue_size=QUEUE_SIZE, batch_size=BATCH_SIZE,
+                 flush_interval=FLUSH_INTERVAL):
+        self.writer = writer
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.events = queue.Queue(queue_size)
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.error = None
+        self.thread = threading.Thread(target=self.write_events, daemon=True)
+        self.thread.start()
+
+    def attach(self, game):
+        """Starts recording the events of a game. Only events sent from now
+        on are recorded, so to record the Spawn of a game's first
+        Tetromino, attach before the game is reset.
+
+        Args:
+            game (Game): The game to record.
+        """
+        game.listeners.append(functools.partial(self.record, game))
+
+    def record(self, game, event):
+        """Queues an event to be written, or drops it if the queue is full.
+
+        Args:
+            game (Game): The game that sent the event.
+            event (tuple): The event.
+        """
+        try:
+            self.events.put_nowait((time.time(), game.seed, event))
+        except queue.Full:
+            self.dropped += 1
+
+    def write_events(self):
+        """Runs in the writer thread, writing queued events in batches until
+        close is called, then closes the writer.
+        """
+        batch = []
+        deadline = None
+        running = True
+        while running:
+            timeout = (None if deadline is None
+                       else max(0.0, deadline - time.monotonic()))
+            try:
+                item = self.events.get(timeout=timeout)
+            except queue.Empty:
+                item = ()
+            if item is None:
+                running = False
+            elif item:
+                batch.append(to_record(*item))
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+            if batch and (not running or len(batch) >= self.batch_size
+                          or time.monotonic() >= deadline):
+                self.flush(batch)
+                batch = []
+                deadline = None
+        self.writer.close()
+
+    def flush(self, batch):
+        """Writes a batch of events, counting them as failed if the writer
+        raises.
+
+        Args:
+            batch (list): A dict for every event.
+        """
+        try:
+            self.writer.write(batch)
+            self.written += len(batch)
+        except Exception as error:
+            self.error = error
+            self.failed += len(batch)
+
+    def close(self):
+        """Writes the events still queued and waits for the writer thread to
+        close the writer.
+        """
+        if not self.thread.is_alive():
+            return
+        # Waits for room, since the queued events are written before
+        # stopping.
+        self.events.put(None)
+        self.thread.join()
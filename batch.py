@@ -0,0 +1,356 @@
+#! python3
+"""Steps many games of Tetros at once with NumPy.
+
+BatchGame holds N boards as a single (N, ROWS, COLUMNS) array and applies
+every rule in engine.Game (moves, gravity, locking, line clears and scoring)
+to all of them with vectorized operations, so bots and balance tests don't
+pay for a Python loop per game.
+"""
+
+import numpy as np
+
+from engine import (COLUMNS, ROWS, SHAPES, ROTATIONS, KICKS, Tetromino,
+                    LEFT, RIGHT, ROTATE, ROTATE_CC, DROP, HARD_DROP, FREEZE,
+                    UNFREEZE)
+
+LINE_SCORES = np.array([0, 100, 300, 500, 800], dtype=np.int64)
+
+
+def build_cell_table():
+    """Copies engine.ROTATIONS into an array.
+
+    Returns:
+        numpy array: An int array of shape (len(SHAPES), 4, 4, 2) holding the
+            (row, column) offset of each of the four squares, relative to
+            the Tetromino's bounding box.
+    """
+    table = np.zeros((len(SHAPES), 4, 4, 2), dtype=np.int64)
+    for i, rotations in enumerate(ROTATIONS):
+        for rotation, state in enumerate(rotations):
+            table[i, rotation] = [(y, x) for x, y in state.cells]
+    return table
+
+
+def build_kick_table():
+    """Copies engine.KICKS into an array, repeating the last offset for
+    shapes with fewer than five.
+
+    Returns:
+        numpy array: An int array of shape (len(SHAPES), 4, 2, 5, 2) holding
+            the (column, row) offsets to try for every shape, starting
+            rotation and direction, with clockwise turns at index 0 and
+            counterclockwise turns at index 1.
+    """
+    table = np.zeros((len(SHAPES), 4, 2, 5, 2), dtype=np.int64)
+    for i, kicks in enumerate(KICKS):
+        for rotation in range(4):
+            for d, direction in enumerate((1, -1)):
+                offsets = list(kicks[rotation][direction])
+                offsets += [offsets[-1]] * (5 - len(offsets))
+                table[i, rotation, d] = offsets
+    return table
+
+
+CELLS = build_cell_table()
+KICK_TABLE = build_kick_table()
+
+
+class BatchGame:
+    """Class used to run many games in lockstep.
+
+    Every per-game value that engine.Game keeps as an attribute is stored
+    here as an array with one entry per game. Games that top out are reset
+    automatically at the end of the step in which they ended.
+    """
+
+    def __init__(self, count, columns=COLUMNS, rows=ROWS, seed=None):
+        self.count = count
+        self.columns = columns
+        self.rows = rows
+        self.rng = np.random.default_rng(seed)
+        self.boards = np.zeros((count, rows, columns), dtype=np.uint8)
+        self.shape = np.zeros(count, dtype=np.int64)
+        self.rotation = np.zeros(count, dtype=np.int64)
+        self.left = np.zeros(count, dtype=np.int64)
+        self.top = np.zeros(count, dtype=np.int64)
+        self.tick_count = np.zeros(count, dtype=np.float64)
+        self.drop_rate = np.zeros(count, dtype=np.float64)
+        self.falling = np.ones(count, dtype=bool)
+        self.score = np.zeros(count, dtype=np.int64)
+        self.level = np.ones(count, dtype=np.int64)
+        self.level_progress = np.zeros(count, dtype=np.int64)
+        self.bags = np.zeros((count, 2 * len(SHAPES)), dtype=np.int64)
+        self.bag_position = np.zeros(count, dtype=np.int64)
+        self.placements = 0
+        self.reset(np.ones(count, dtype=bool))
+
+    def shuffled_bags(self, count):
+        """Returns one bag of every shape, in a random order, per game.
+
+        Args:
+            count (int): The number of bags to create.
+
+        Returns:
+            numpy array: An int array of shape (count, len(SHAPES)).
+        """
+        return self.rng.random((count, len(SHAPES))).argsort(axis=1)
+
+    def reset(self, mask):
+        """Starts a new game on every board selected by the mask.
+
+        Args:
+            mask (numpy array): A bool array with one entry per game.
+        """
+        count = int(mask.sum())
+        if not count:
+            return
+        self.boards[mask] = 0
+        self.score[mask] = 0
+        self.level[mask] = 1
+        self.level_progress[mask] = 0
+        self.bags[mask, :len(SHAPES)] = self.shuffled_bags(count)
+        self.bags[mask, len(SHAPES):] = self.shuffled_bags(count)
+        self.bag_position[mask] = 0
+        self.spawn(mask)
+
+    def spawn(self, mask):
+        """Takes the next shape out of the bag for every selected game and
+        puts it in the starting position, like engine.Tetromino does.
+
+        Args:
+            mask (numpy array): A bool array with one entry per game.
+        """
+        index = np.flatnonzero(mask)
+        if not index.size:
+            return
+        shape = self.bags[index, self.bag_position[index]]
+        self.bag_position[index] += 1
+        refill = index[self.bag_position[index] == len(SHAPES)]
+        if refill.size:
+            self.bags[refill, :len(SHAPES)] = self.bags[refill, len(SHAPES):]
+            self.bags[refill, len(SHAPES):] = self.shuffled_bags(refill.size)
+            self.bag_position[refill] = 0
+
+        large = shape < 2
+        self.shape[index] = shape
+        self.rotation[index] = 0
+        self.left[index] = np.where(large, self.columns // 2 - 2,
+                                    self.columns // 2 - 1)
+        self.top[index] = np.where(large, -3, -5)
+        self.tick_count[index] = 0
+        self.drop_rate[index] = Tetromino.DROP_RATE
+        self.falling[index] = True
+
+    @property
+    def next_shape(self):
+        """numpy array: The index into SHAPES of each game's next shape."""
+        return self.bags[np.arange(self.count), self.bag_position]
+
+    def cells(self, left=None, top=None, rotation=None):
+        """Returns the board cells covered by every game's current Tetromino.
+
+        Args:
+            left (numpy array): Overrides the column of each bounding box.
+            top (numpy array): Overrides the row of each bounding box.
+            rotation (numpy array): Overrides the rotation of each Tetromino.
+
+        Returns:
+            tuple: Two int arrays of shape (count, 4), holding the column
+                and the row of each square.
+        """
+        left = self.left if left is None else left
+        top = self.top if top is None else top
+        rotation = self.rotation if rotation is None else rotation
+        offsets = CELLS[self.shape, rotation]
+        return (left[:, None] + offsets[:, :, 1],
+                top[:, None] + offsets[:, :, 0])
+
+    def is_occupied(self, columns, rows):
+        """Checks whether cells are blocked, with the same rules as
+        engine.Board.is_occupied.
+
+        Args:
+            columns (numpy array): An int array of shape (count, k).
+            rows (numpy array): An int array of shape (count, k).
+
+        Returns:
+            numpy array: A bool array of shape (count, k).
+        """
+        outside = (columns < 0) | (columns >= self.columns) | \
+            (rows >= self.rows)
+        inside = ~outside & (rows >= 0)
+        values = self.boards[
+            np.arange(self.count)[:, None],
+            np.clip(rows, 0, self.rows - 1),
+            np.clip(columns, 0, self.columns - 1)
+        ]
+        return outside | (inside & (values != 0))
+
+    def drop_distances(self):
+        """Finds how far every game's current Tetromino can fall, like
+        engine.Tetromino.drop_distance.
+
+        Returns:
+            numpy array: The number of rows each Tetromino can move down
+                before it lands.
+        """
+        # below[g, r, c] is the first filled row of column c at or below
+        # row r, or self.rows if there is none, with an extra row at the
+        # bottom for the cells resting on the floor.
+        below = np.where(self.boards != 0,
+                         np.arange(self.rows)[None, :, None], self.rows)
+        below = np.minimum.accumulate(below[:, ::-1], axis=1)[:, ::-1]
+        below = np.concatenate(
+            [below, np.full((self.count, 1, self.columns), self.rows)],
+            axis=1)
+        columns, rows = self.cells()
+        landing = below[np.arange(self.count)[:, None],
+                        np.clip(rows + 1, 0, self.rows), columns]
+        return (landing - 1 - rows).min(axis=1)
+
+    def apply(self, actions):
+        """Applies one input to every game, like engine.Game.apply.
+
+        Args:
+            actions (numpy array): An int array with one of NOOP, LEFT,
+                RIGHT, ROTATE, ROTATE_CC, DROP, HARD_DROP, FREEZE or
+                UNFREEZE per game.
+        """
+        for action, offset in ((LEFT, -1), (RIGHT, 1)):
+            chosen = actions == action
+            if chosen.any():
+                columns, rows = self.cells(left=self.left + offset)
+                blocked = self.is_occupied(columns, rows).any(axis=1)
+                self.left += np.where(chosen & ~blocked, offset, 0)
+        for action, d, direction in ((ROTATE, 0, 1), (ROTATE_CC, 1, -1)):
+            pending = actions == action
+            if not pending.any():
+                continue
+            rotation = (self.rotation + direction) % 4
+            kicks = KICK_TABLE[self.shape, self.rotation, d]
+            for k in range(kicks.shape[1]):
+                left = self.left + kicks[:, k, 0]
+                top = self.top + kicks[:, k, 1]
+                columns, rows = self.cells(left, top, rotation)
+                fits = pending & ~self.is_occupied(columns, rows).any(axis=1)
+                self.rotation = np.where(fits, rotation, self.rotation)
+                self.left = np.where(fits, left, self.left)
+                self.top = np.where(fits, top, self.top)
+                pending &= ~fits
+        hard_drop = actions == HARD_DROP
+        if hard_drop.any():
+            self.top += np.where(hard_drop, self.drop_distances(), 0)
+        self.drop_rate[actions == DROP] = 0.5
+        self.falling[actions == FREEZE] = False
+        self.falling[actions == UNFREEZE] = True
+
+    def lock(self, mask):
+        """Fixes every selected game's current Tetromino in place, then
+        clears full rows and scores them.
+
+        Args:
+            mask (numpy array): A bool array with one entry per game.
+
+        Returns:
+            tuple: An int array with the score gained by each game, and a
+                bool array marking the games that topped out.
+        """
+        columns, rows = self.cells()
+        over = mask & (rows < 0).any(axis=1)
+        placing = mask & ~over
+        index = np.flatnonzero(placing)
+        self.boards[index[:, None], rows[index], columns[index]] = \
+            (self.shape[index] + 1)[:, None]
+        self.placements += index.size
+
+        rows_cleared = self.clear_lines(placing)
+        rewards = LINE_SCORES[rows_cleared] * self.level
+        self.score += rewards
+        self.level_progress += rows_cleared
+        level_up = self.level_progress == 10
+        self.level_progress[level_up] = 0
+        self.level[level_up] += 1
+        self.spawn(placing)
+        return rewards, over
+
+    def clear_lines(self, mask):
+        """Removes every full row on the selected boards and moves the rows
+        above it down, like engine.check_lines.
+
+        Args:
+            mask (numpy array): A bool array with one entry per game.
+
+        Returns:
+            numpy array: The number of rows cleared on each board.
+        """
+        full = (self.boards != 0).all(axis=2) & mask[:, None]
+        rows_cleared = full.sum(axis=1)
+        index = np.flatnonzero(rows_cleared)
+        if index.size:
+            keep = ~full[index]
+            destination = self.rows - np.cumsum(keep[:, ::-1], axis=1)[:, ::-1]
+            compacted = np.zeros((index.size, self.rows, self.columns),
+                                 dtype=self.boards.dtype)
+            board, row = np.nonzero(keep)
+            compacted[board, destination[board, row]] = \
+                self.boards[index[board], row]
+            self.boards[index] = compacted
+        return rows_cleared
+
+    def step(self, actions):
+        """Applies one input to every game and advances them all by one
+        frame, with the same order of rules as engine.Game.tick.
+
+        Args:
+            actions (numpy array): An int array with one action per game.
+
+        Returns:
+            tuple: An int array with the score gained by each game during
+                the frame, and a bool array marking the games that ended.
+        """
+        self.apply(np.asarray(actions))
+
+        columns, rows = self.cells(top=self.top + 1)
+        landed = self.is_occupied(columns, rows).any(axis=1)
+        rewards, over = self.lock(landed)
+
+        moving = self.falling & ~over
+        self.tick_count += np.where(moving, self.level / 2, 0)
+        fell = moving & (self.tick_count > self.drop_rate)
+        self.top += fell
+        self.tick_count[fell] = 0
+
+        self.reset(over)
+        return rewards, over
+
+    def place(self, rotations, lefts):
+        """Drops every game's current Tetromino straight down in the given
+        rotation and column, then locks it. The Tetrominos are moved into
+        position without checking the path, as a bot choosing placements
+        would do.
+
+        Args:
+            rotations (numpy array): The rotation, from 0 to 3, per game.
+            lefts (numpy array): The column of the bounding box per game.
+                Values that would put a square past a wall are clamped.
+
+        Returns:
+            tuple: An int array with the score gained by each game, and a
+                bool array marking the games that ended.
+        """
+        self.rotation = np.asarray(rotations) % 4
+        offsets = CELLS[self.shape, self.rotation]
+        low = -offsets[:, :, 1].min(axis=1)
+        high = self.columns - 1 - offsets[:, :, 1].max(axis=1)
+        self.left = np.clip(np.asarray(lefts), low, high)
+
+        columns = self.left[:, None] + offsets[:, :, 1]
+        filled = self.boards != 0
+        surface = np.where(filled.any(axis=1), filled.argmax(axis=1),
+                           self.rows)
+        tops = surface[np.arange(self.count)[:, None], columns]
+        self.top = (tops - 1 - offsets[:, :, 0]).min(axis=1)
+
+        rewards, over = self.lock(np.ones(self.count, dtype=bool))
+        self.reset(over)
+        return rewards, over
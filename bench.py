@@ -0,0 +1,542 @@
+#! python3
+"""Benchmarks for the hot paths of Tetros.
+
+Every benchmark is run against three boards: an empty one, one filled
+halfway up, and one filled nearly to the top, except first_frame, the time
+a cold start of the game takes to draw its first frame. Results are written
+as JSON, in microseconds per call, and compared to a stored baseline so
+that a change that makes a frame slower is caught before release:
+
+    python bench.py                      # run, compare to bench_baseline.json
+    python bench.py --update-baseline    # run and store a new baseline
+
+Every time is the median of REPEATS runs. Storing a baseline runs every
+benchmark BASELINE_RUNS times, and stores the median of those and how far
+apart they were as the benchmark's noise. A benchmark only counts as a
+regression when it is slower than the baseline by more than the
+threshold plus its noise, and stays that slow when it is timed again up
+to CONFIRM_RUNS times, so one slow run on a busy machine doesn't fail
+the check.
+
+Baselines are only comparable on the same machine, so regenerate the
+baseline when the benchmarks move to different hardware.
+
+The memory a headless frame allocates is measured too, with tracemalloc,
+and checked against fixed budgets rather than the baseline: at most
+ALLOCATION_BUDGET bytes allocated at the peak of a frame, and at most
+LEAK_BUDGET memory blocks still allocated after it, on average.
+
+Frames aren't free of allocations. A frame allocates about 600 bytes at
+its peak, all of it freed before the frame ends:
+- the set of cells the current Tetromino covers;
+- the lists of changed rows and dirty areas, built for Surface.blits and
+  pygame.display.update;
+- the Rects that Surface.blit returns when the score or next piece is
+  redrawn.
+Keeping them in preallocated buffers would make the renderer harder to
+follow without making a frame measurably faster. So the budgets are set
+to catch new allocations that grow with the board or outlive the frame,
+rather than to demand none.
+"""
+
+import argparse
+import functools
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import timeit
+import tracemalloc
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+from engine import Board, Game, check_lines
+
+
+BASELINE_PATH = "bench_baseline.json"
+OUTPUT_PATH = "bench_results.json"
+THRESHOLD = 0.25
+TOLERANCE = 0.5
+MIN_TIME = 0.1
+REPEATS = 7
+STARTUP_RUNS = 5
+BASELINE_RUNS = 3
+CONFIRM_RUNS = 3
+ALLOCATION_BUDGET = 768
+LEAK_BUDGET = 0.1
+ALLOCATION_FRAMES = 600
+# pygame keeps a few more memory blocks over its first few thousand
+# display updates, so frames are run that long before looking for leaks.
+ALLOCATION_WARMUP = 3000
+
+# Run in a new interpreter to time a cold start of the game, up to and
+# including its first frame.
+STARTUP_SCRIPT = """
+import tetros
+window = tetros.startup()
+renderer = tetros.Renderer(window)
+renderer.draw(tetros.Game())
+tetros.report_first_frame()
+"""
+
+# How many rows of each fixture are filled, counted from the floor.
+FIXTURES = {
+    "empty": 0,
+    "half": 11,
+    "near_top": 19,
+}
+
+
+def make_board(filled_rows, full_rows=0, seed=0):
+    """Builds a board for a benchmark.
+
+    Args:
+        filled_rows (int): The number of rows to fill, counted from the
+            floor. Every row gets a gap at a random column, so none of them
+            are full.
+        full_rows (int): The number of the filled rows, counted from the
+            floor, to leave without a gap.
+        seed (int): The seed used to pick the gaps.
+
+    Returns:
+        Board: The board.
+    """
+    generator = random.Random(seed)
+    board = Board()
+    for i in range(filled_rows):
+        row = board.rows - 1 - i
+        gap = None if i < full_rows else generator.randrange(board.columns)
+        board.place([(column, row) for column in range(board.columns)
+                     if column != gap], i % 7)
+    return board
+
+
+def make_game(filled_rows):
+    """Builds a game with its current Tetromino just above the stack.
+
+    Args:
+        filled_rows (int): The number of rows of the board to fill.
+
+    Returns:
+        Game: The game.
+    """
+    game = Game(seed=0)
+    game.board = make_board(filled_rows)
+    game.current.top = game.board.rows - filled_rows - 4
+    return game
+
+
+def time_call(function, calls=1):
+    """Times a function that takes no arguments.
+
+    Args:
+        function (function): The function to time.
+        calls (int): The number of calls of the code being timed that the
+            function makes, so the time of one call is returned.
+
+    Returns:
+        float: The median time per call, in microseconds, of REPEATS runs
+            of at least MIN_TIME seconds each.
+    """
+    timer = timeit.Timer(function)
+    number = 1
+    while timer.timeit(number) < MIN_TIME:
+        number *= 2
+    median = statistics.median(timer.repeat(REPEATS, number))
+    return median / number / calls * 1e6
+
+
+def measure_allocations(step, frames=ALLOCATION_FRAMES,
+                        warmup=ALLOCATION_WARMUP):
+    """Measures the memory allocated by each call of a frame function.
+
+    Args:
+        step (function): Called with no arguments to run one frame, for
+            example a function that ticks a Game and draws it.
+        frames (int): The number of frames to measure.
+        warmup (int): The number of frames to run first, so that caches are
+            filled before measuring.
+
+    Returns:
+        tuple: The average number of memory blocks still allocated after
+            each frame, and the average number of bytes allocated at the
+            peak of each frame, as seen by tracemalloc.
+    """
+    for _ in range(warmup):
+        step()
+    tracemalloc.start()
+    results = []
+    # The first pass measures an empty frame, to subtract the memory used
+    # by the measuring itself.
+    for frame in (lambda: None, step):
+        peak = 0
+        blocks = sys.getallocatedblocks()
+        for _ in range(frames):
+            tracemalloc.reset_peak()
+            start = tracemalloc.get_traced_memory()[0]
+            frame()
+            peak += tracemalloc.get_traced_memory()[1] - start
+        results.append((sys.getallocatedblocks() - blocks, peak))
+    tracemalloc.stop()
+    (empty_blocks, empty_peak), (blocks, peak) = results
+    return (blocks - empty_blocks) / frames, (peak - empty_peak) / frames
+
+
+def bench_engine(fixture, filled_rows):
+    """Builds the benchmarks of the rules in engine.py on one fixture.
+
+    Args:
+        fixture (string): The name of the fixture.
+        filled_rows (int): The number of rows the fixture fills.
+
+    Returns:
+        dict: For every benchmark, keyed by name, a function that times it
+            and returns microseconds per call.
+    """
+    # check_lines changes the board, so it is timed on a fresh copy each
+    # call, and the time includes making the copy.
+    board = make_board(filled_rows, full_rows=min(filled_rows, 4))
+    game = make_game(filled_rows)
+    tetromino = game.current
+
+    def shift():
+        tetromino.shift("left", game.board)
+        tetromino.shift("right", game.board)
+
+    def rotate():
+        tetromino.rotate(game.board)
+        tetromino.rotate_cc(game.board)
+
+    # The time of a tick includes restoring the game to where it started.
+    state = game.snapshot()
+
+    def tick():
+        game.restore(state)
+        game.tick()
+
+    return {
+        f"check_lines[{fixture}]": functools.partial(
+            time_call, lambda: check_lines(board.copy())),
+        f"landed[{fixture}]": functools.partial(
+            time_call, lambda: tetromino.landed(game.board)),
+        f"drop_distance[{fixture}]": functools.partial(
+            time_call, lambda: tetromino.drop_distance(game.board)),
+        f"shift[{fixture}]": functools.partial(time_call, shift, calls=2),
+        f"rotate[{fixture}]": functools.partial(time_call, rotate, calls=2),
+        f"tick[{fixture}]": functools.partial(time_call, tick),
+    }
+
+
+@functools.cache
+def open_window():
+    """Starts the game with the SDL dummy video driver, the first time it
+    is called, so nothing is drawn until a rendering benchmark runs.
+
+    Returns:
+        Surface: The window.
+    """
+    import tetros
+    return tetros.startup()
+
+
+def make_frame(filled_rows):
+    """Builds a function that runs one frame of a game without waiting:
+    it makes a move, ticks the game and draws it. The game is restored to
+    where it started every 60 frames, and whenever it is over.
+
+    Args:
+        filled_rows (int): The number of rows of the board to fill.
+
+    Returns:
+        function: The frame function.
+    """
+    import tetros
+
+    game = make_game(filled_rows)
+    renderer = tetros.Renderer(open_window())
+    state = game.snapshot()
+    actions = [1, 2, 3, 4, 0, 0, 0, 0]
+    frame_number = [0]
+
+    def headless_frame():
+        frame_number[0] += 1
+        if game.over or frame_number[0] % 60 == 0:
+            game.restore(state)
+        game.apply(actions[frame_number[0] % len(actions)])
+        game.tick()
+        renderer.draw(game)
+    return headless_frame
+
+
+def bench_render(fixture, filled_rows):
+    """Builds the benchmarks of drawing one fixture with the SDL dummy
+    video driver, and of the memory a frame allocates. Each of them sets
+    up its own game and renderer when it runs.
+
+    Args:
+        fixture (string): The name of the fixture.
+        filled_rows (int): The number of rows the fixture fills.
+
+    Returns:
+        tuple: For every timing benchmark, keyed by name, a function that
+            returns microseconds per call, and for every allocation
+            benchmark a function that returns the blocks left and peak
+            bytes allocated per frame.
+    """
+    def time_draw_window():
+        import pygame
+        import tetros
+
+        window = open_window()
+        play_area = pygame.Surface((tetros.PLAY_AREA_WIDTH,
+                                    tetros.PLAY_AREA_HEIGHT))
+        score_area = pygame.Surface((tetros.SCORE_WIDTH,
+                                     tetros.SCORE_HEIGHT))
+        next_piece = pygame.Surface((tetros.NEXT_PIECE_SIZE,
+                                     tetros.NEXT_PIECE_SIZE))
+        game = make_game(filled_rows)
+        return time_call(lambda: tetros.draw_window(
+            window, play_area, score_area, next_piece, game))
+
+    def time_full_frame():
+        import tetros
+
+        renderer = tetros.Renderer(open_window())
+        game = make_game(filled_rows)
+
+        def full_frame():
+            renderer.invalidate()
+            renderer.draw(game)
+        return time_call(full_frame)
+
+    def time_moving_frame():
+        import tetros
+
+        renderer = tetros.Renderer(open_window())
+        game = make_game(filled_rows)
+        tetromino = game.current
+
+        def moving_frame():
+            tetromino.left ^= 1
+            renderer.draw(game)
+        return time_call(moving_frame)
+
+    timings = {
+        f"draw_window[{fixture}]": time_draw_window,
+        f"renderer_full[{fixture}]": time_full_frame,
+        f"renderer_dirty[{fixture}]": time_moving_frame,
+        f"frame[{fixture}]": lambda: time_call(make_frame(filled_rows)),
+    }
+    allocations = {
+        f"frame_allocations[{fixture}]":
+            lambda: measure_allocations(make_frame(filled_rows)),
+    }
+    return timings, allocations
+
+
+def bench_startup():
+    """Times starting the game in a new Python process, from importing
+    tetros until the first frame is drawn, as reported by the game.
+
+    Returns:
+        float: The median time to the first frame of STARTUP_RUNS runs, in
+            microseconds.
+    """
+    times = []
+    for _ in range(STARTUP_RUNS):
+        output = subprocess.run(
+            [sys.executable, "-c", STARTUP_SCRIPT],
+            capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))).stderr
+        line = next(line for line in output.splitlines()
+                    if line.startswith("Time to first frame:"))
+        times.append(float(line.split()[-2]) * 1000)
+    return statistics.median(times)
+
+
+def benchmarks(pattern=None):
+    """Collects the benchmarks to run, without setting up or timing any
+    of them.
+
+    Args:
+        pattern (string): Only benchmarks whose name contains this are
+            collected.
+
+    Returns:
+        tuple: A function that returns microseconds per call for every
+            timing benchmark, and a function that returns the blocks left
+            and peak bytes allocated per frame for every allocation
+            benchmark, both keyed by benchmark name.
+    """
+    timings = {}
+    allocations = {}
+    for fixture, filled_rows in FIXTURES.items():
+        timings.update(bench_engine(fixture, filled_rows))
+        render_timings, render_allocations = bench_render(fixture,
+                                                          filled_rows)
+        timings.update(render_timings)
+        allocations.update(render_allocations)
+    timings["first_frame"] = bench_startup
+    if pattern:
+        timings = {name: measure for name, measure in timings.items()
+                   if pattern in name}
+        allocations = {name: measure
+                       for name, measure in allocations.items()
+                       if pattern in name}
+    return timings, allocations
+
+
+def run(timings, runs=1):
+    """Runs timing benchmarks, more than once to find out how noisy they
+    are. The runs take turns, so that a busy moment of the machine doesn't
+    slow down every run of the same benchmark.
+
+    Args:
+        timings (dict): A function that returns microseconds per call for
+            every benchmark, keyed by name, from benchmarks.
+        runs (int): The number of times to run every benchmark.
+
+    Returns:
+        tuple: The median microseconds per call of the runs, and how far
+            apart the fastest and slowest runs were as a fraction of the
+            median, both keyed by benchmark name.
+    """
+    times = {name: [] for name in timings}
+    for _ in range(runs):
+        for name, measure in timings.items():
+            times[name].append(measure())
+    results = {}
+    noise = {}
+    for name, values in times.items():
+        results[name] = statistics.median(values)
+        noise[name] = ((max(values) - min(values)) / results[name]
+                       if results[name] else 0.0)
+    return results, noise
+
+
+def compare(results, baseline, noise=None, threshold=THRESHOLD,
+            timings=None):
+    """Finds the benchmarks that got slower than the baseline.
+
+    Args:
+        results (dict): Microseconds per call, keyed by benchmark name.
+        baseline (dict): The same, from the baseline run.
+        noise (dict): How noisy each benchmark was when the baseline was
+            stored, as a fraction of the baseline, keyed by benchmark name.
+        threshold (float): How much slower, as a fraction of the baseline,
+            a benchmark can get on top of its noise before it counts as a
+            regression. A benchmark must also be TOLERANCE microseconds
+            slower, so timer noise on the fastest benchmarks isn't
+            reported.
+        timings (dict): A function that times each benchmark again, keyed
+            by name. An apparent regression is timed again up to
+            CONFIRM_RUNS times, and isn't reported if any of those runs is
+            within the limit.
+
+    Returns:
+        list: (name, baseline, result) for every regression, where result
+            is the fastest time measured.
+    """
+    noise = noise or {}
+    timings = timings or {}
+    regressions = []
+    for name, value in results.items():
+        if name not in baseline:
+            continue
+        limit = max(baseline[name] * (1 + threshold + noise.get(name, 0.0)),
+                    baseline[name] + TOLERANCE)
+        if value > limit and name in timings:
+            for _ in range(CONFIRM_RUNS):
+                value = min(value, timings[name]())
+                if value <= limit:
+                    break
+        if value > limit:
+            regressions.append((name, baseline[name], value))
+    return regressions
+
+
+def over_budget(allocations):
+    """Finds the frames that allocate more than the budgets allow.
+
+    Args:
+        allocations (dict): The blocks left and peak bytes allocated per
+            frame, keyed by benchmark name.
+
+    Returns:
+        list: (name, blocks, peak) for every frame over budget.
+    """
+    return [(name, blocks, peak)
+            for name, (blocks, peak) in allocations.items()
+            if blocks > LEAK_BUDGET or peak > ALLOCATION_BUDGET]
+
+
+def main():
+    """Runs the benchmarks from the command line.
+
+    Returns:
+        int: 1 if any benchmark regressed or any frame allocated more than
+            its budget, otherwise 0.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--output", default=OUTPUT_PATH)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    parser.add_argument("--filter", default=None,
+                        help="only run benchmarks whose name contains this")
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+
+    timings, allocation_benchmarks = benchmarks(args.filter)
+    results, noise = run(timings,
+                         BASELINE_RUNS if args.update_baseline else 1)
+    allocations = {name: measure()
+                   for name, measure in allocation_benchmarks.items()}
+    report = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "unit": "us",
+        "results": results,
+        "allocations": {name: {"blocks": blocks, "peak_bytes": peak}
+                        for name, (blocks, peak) in allocations.items()},
+    }
+    with open(args.output, "w") as output_file:
+        json.dump(report, output_file, indent=2, sort_keys=True)
+
+    baseline = {}
+    baseline_noise = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as baseline_file:
+            stored = json.load(baseline_file)
+        baseline = stored["results"]
+        baseline_noise = stored.get("noise", {})
+    for name, value in sorted(results.items()):
+        change = ""
+        if name in baseline and baseline[name]:
+            change = f"{(value / baseline[name] - 1) * 100:+7.1f}%"
+        print(f"{name:32} {value:12.2f} us {change}")
+    for name, (blocks, peak) in sorted(allocations.items()):
+        print(f"{name:32} {peak:12.0f} B peak {blocks:7.2f} blocks left")
+    allocation_failures = over_budget(allocations)
+    for name, blocks, peak in allocation_failures:
+        print(f"OVER BUDGET {name}: {peak:.0f} B peak (budget "
+              f"{ALLOCATION_BUDGET}), {blocks:.2f} blocks left (budget "
+              f"{LEAK_BUDGET})")
+
+    if args.update_baseline:
+        report["noise"] = noise
+        with open(args.baseline, "w") as baseline_file:
+            json.dump(report, baseline_file, indent=2, sort_keys=True)
+        return 1 if allocation_failures else 0
+
+    regressions = compare(results, baseline, baseline_noise,
+                          args.threshold, timings)
+    for name, before, after in regressions:
+        print(f"REGRESSION {name}: {before:.2f} us -> {after:.2f} us")
+    return 1 if regressions or allocation_failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
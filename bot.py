@@ -0,0 +1,305 @@
+#! python3
+"""A bot that plays Tetros, for soak tests and demo mode.
+
+For every piece, the bot tries every rotation of the current Tetromino in
+every column, and for each of those every placement of the next Tetromino,
+and keeps the one that leaves the best board according to a heuristic. The
+placements of the current Tetromino are split between worker processes.
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from engine import (ROTATIONS, Game, Tetromino, check_lines,
+                    LEFT, RIGHT, ROTATE, DROP, HARD_DROP)
+
+
+# Heuristic weights, from Yiyuan Lee's "Tetris AI - The (Near) Perfect Bot".
+HEIGHT_WEIGHT = -0.510066
+LINES_WEIGHT = 0.760666
+HOLES_WEIGHT = -0.35663
+BUMPINESS_WEIGHT = -0.184483
+
+
+def placements(board, tetromino):
+    """Finds every final position a Tetromino can be dropped into, for every
+    rotation and column. The Tetromino is dropped straight down from where
+    it is, without sliding it under overhangs.
+
+    Args:
+        board (Board): The board to drop the Tetromino onto.
+        tetromino (Tetromino): The Tetromino to drop. It is not moved.
+
+    Yields:
+        tuple: The rotation, left and top of each landing position.
+    """
+    piece = Tetromino(tetromino.shape, board.columns)
+    piece.top = tetromino.top
+    seen = set()
+    for rotation, state in enumerate(ROTATIONS[piece.shape_index]):
+        piece.rotation = rotation
+        for left in range(-state.left, board.columns - state.right):
+            piece.left = left
+            if not piece.fits(board, left, tetromino.top, rotation):
+                continue
+            top = tetromino.top + piece.drop_distance(board)
+            cells = frozenset(piece.cells(rows=top - tetromino.top))
+            if cells in seen:
+                continue
+            seen.add(cells)
+            yield rotation, left, top
+
+
+def drop(board, shape, rotation, left, top):
+    """Places a Tetromino on a copy of a board and clears any full rows.
+
+    Args:
+        board (Board): The board to place the Tetromino on. It is not changed.
+        shape (string): The shape of the Tetromino.
+        rotation (int): The rotation of the Tetromino.
+        left (int): The column of the Tetromino's bounding box.
+        top (int): The row of the Tetromino's bounding box.
+
+    Returns:
+        tuple: The new board and the number of rows cleared.
+    """
+    board = board.copy()
+    tetromino = Tetromino(shape, board.columns)
+    tetromino.rotation = rotation
+    tetromino.left = left
+    tetromino.top = top
+    board.place(tetromino.cells(), tetromino.shape_index)
+    return check_lines(board)
+
+
+def evaluate(board, rows_cleared):
+    """Scores a board with a weighted sum of its total column height, the
+    rows just cleared, the holes under the stack, and how uneven the
+    surface is.
+
+    Args:
+        board (Board): The board to score.
+        rows_cleared (int): The number of rows cleared to reach the board.
+
+    Returns:
+        float: The score of the board. Higher is better.
+    """
+    if board.topped_out:
+        return float("-inf")
+    heights = [board.rows - height for height in board.heights]
+    total_height = sum(heights)
+    filled = sum(mask.bit_count() for mask in board.masks)
+    holes = total_height - filled
+    bumpiness = sum(abs(heights[i] - heights[i + 1])
+                    for i in range(len(heights) - 1))
+    return (HEIGHT_WEIGHT * total_height + LINES_WEIGHT * rows_cleared +
+            HOLES_WEIGHT * holes + BUMPINESS_WEIGHT * bumpiness)
+
+
+def search(board, shape, next_shape, moves):
+    """Finds the best of some placements of the current Tetromino, looking
+    at every placement of the next Tetromino after each of them. This is
+    the part of the search that runs in the worker processes.
+
+    Args:
+        board (Board): The board to place the Tetrominos on.
+        shape (string): The shape of the current Tetromino.
+        next_shape (string): The shape of the next Tetromino.
+        moves (list): (rotation, left, top) placements of the current
+            Tetromino to try.
+
+    Returns:
+        tuple: The score of the best placement, the placement, and the
+            number of boards that were evaluated.
+    """
+    best_score = float("-inf")
+    best_move = None
+    evaluated = 0
+    next_tetromino = Tetromino(next_shape, board.columns)
+    for move in moves:
+        first, first_cleared = drop(board, shape, *move)
+        evaluated += 1
+        if first.topped_out:
+            score = float("-inf")
+        else:
+            score = evaluate(first, first_cleared)
+            second_best = float("-inf")
+            for next_move in placements(first, next_tetromino):
+                second, second_cleared = drop(first, next_shape, *next_move)
+                evaluated += 1
+                second_best = max(second_best, evaluate(
+                    second, first_cleared + second_cleared))
+            if second_best > float("-inf"):
+                score = second_best
+        if best_move is None or score > best_score:
+            best_score = score
+            best_move = move
+    return best_score, best_move, evaluated
+
+
+class Bot:
+    """Class used to choose and make moves for a Game.
+
+    The placements of the current Tetromino are split into one chunk per
+    worker process. With workers set to 0 the search runs in the calling
+    process instead, which is faster for a single game on a small board
+    where the cost of sending work to other processes dominates.
+
+    Attributes:
+        evaluated (int): The number of boards scored so far.
+        search_time (float): The number of seconds spent searching so far.
+    """
+
+    def __init__(self, workers=None):
+        self.workers = os.cpu_count() if workers is None else workers
+        self.executor = None
+        if self.workers:
+            self.executor = ProcessPoolExecutor(self.workers)
+        self.evaluated = 0
+        self.search_time = 0.0
+        self.tetromino = None
+        self.move = None
+
+    def close(self):
+        """Shuts down the worker processes.
+        """
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    @property
+    def placements_per_second(self):
+        """float: The number of boards scored per second of searching."""
+        if not self.search_time:
+            return 0.0
+        return self.evaluated / self.search_time
+
+    def choose(self, game):
+        """Finds the best placement for the current Tetromino.
+
+        Args:
+            game (Game): The game to choose a move for.
+
+        Returns:
+            tuple: The rotation, left and top of the chosen placement, or
+                None if the Tetromino can't be placed anywhere.
+        """
+        start = time.perf_counter()
+        moves = list(placements(game.board, game.current))
+        if not moves:
+            return None
+        shape = game.current.shape
+        next_shape = game.next.shape
+        if self.executor is None:
+            results = [search(game.board, shape, next_shape, moves)]
+        else:
+            chunks = [moves[i::self.workers] for i in range(self.workers)]
+            futures = [self.executor.submit(search, game.board, shape,
+                                            next_shape, chunk)
+                       for chunk in chunks if chunk]
+            results = [future.result() for future in futures]
+        best_score = float("-inf")
+        best_move = None
+        for score, move, evaluated in results:
+            self.evaluated += evaluated
+            if best_move is None or score > best_score:
+                best_score = score
+                best_move = move
+        self.search_time += time.perf_counter() - start
+        return best_move
+
+    def play(self, game):
+        """Moves the current Tetromino into the chosen placement and hard
+        drops it, through Game.apply so the moves can be recorded. Does
+        nothing if the bot has already moved this Tetromino.
+
+        Args:
+            game (Game): The game to play.
+        """
+        if game.current is self.tetromino:
+            return
+        self.tetromino = game.current
+        move = self.choose(game)
+        if move is None:
+            return
+        rotation, left, _ = move
+        for _ in range(rotation):
+            game.apply(ROTATE)
+        while game.current.left > left:
+            before = game.current.left
+            game.apply(LEFT)
+            if game.current.left == before:
+                break
+        while game.current.left < left:
+            before = game.current.left
+            game.apply(RIGHT)
+            if game.current.left == before:
+                break
+        game.apply(HARD_DROP)
+
+    def step(self, game):
+        """Makes one move towards the chosen placement, to be called once
+        every tick so the Tetromino can be seen moving: a rotation or a
+        shift until it is in place, and then a soft drop. The placement is
+        chosen on the first call for each Tetromino. If a move is blocked,
+        the Tetromino is dropped where it is.
+
+        Args:
+            game (Game): The game to play.
+        """
+        tetromino = game.current
+        if tetromino is not self.tetromino:
+            self.tetromino = tetromino
+            self.move = self.choose(game)
+        if self.move is None:
+            return
+        rotation, left, _ = self.move
+        before = (tetromino.rotation, tetromino.left)
+        if tetromino.rotation != rotation:
+            game.apply(ROTATE)
+        elif tetromino.left != left:
+            game.apply(LEFT if tetromino.left > left else RIGHT)
+        else:
+            game.apply(DROP)
+            self.move = None
+            return
+        if (tetromino.rotation, tetromino.left) == before:
+            self.move = (tetromino.rotation, tetromino.left, None)
+
+
+def play_game(bot, seed=None, max_pieces=None, game=None):
+    """Plays a game headless until it is over.
+
+    Args:
+        bot (Bot): The bot that makes the moves.
+        seed (int): The seed of the game's bag.
+        max_pieces (int): Stops the game after this many Tetrominos.
+        game (Game): A game to play in. It is reset.
+
+    Returns:
+        Game: The finished game.
+    """
+    if game is None:
+        game = Game(seed=seed)
+    else:
+        game.reset(seed)
+    pieces = 0
+    while not game.over:
+        if game.current is not bot.tetromino:
+            if max_pieces is not None and pieces >= max_pieces:
+                break
+            pieces += 1
+            bot.play(game)
+        game.tick()
+    return game
+
+
+if __name__ == "__main__":
+    bot = Bot()
+    try:
+        game = play_game(bot, seed=0, max_pieces=200)
+    finally:
+        bot.close()
+    print(f"Score: {game.score}, level: {game.level}, "
+          f"{bot.placements_per_second:.0f} placements evaluated per second")
@@ -0,0 +1,256 @@
+#! python3
+"""Captures frames of Tetros headless, for video clips and for training
+vision models.
+
+Games are drawn by tetros.Renderer into the window surface of SDL's dummy
+video driver, so nothing is shown and the game runs as fast as it can be
+drawn. Every frame is copied straight out of the surface's pixel buffer
+into a preallocated NumPy ring buffer. A background thread converts full
+chunks of the ring to RGB and hands them to a sink, which writes raw frames
+to a pipe, such as the input of ffmpeg, or compressed .npz files:
+
+    python capture.py --replay game.replay --npz frames
+    python capture.py --seed 1 --raw | ffmpeg -f rawvideo -pix_fmt rgb24 \\
+        -s 850x1000 -r 30 -i - clip.mp4
+"""
+
+import argparse
+import os
+import queue
+import sys
+import threading
+
+import numpy as np
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+# pygame prints a greeting to stdout, which would end up among raw frames.
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import pygame
+
+import tetros
+from engine import Game
+from replay import Replay, play
+
+
+CHUNK_FRAMES = 16
+RING_CHUNKS = 4
+
+
+class NpzSink:
+    """Class used to write chunks of frames to numbered, compressed .npz
+    files, each holding a "frames" array of shape (count, height, width,
+    3).
+    """
+
+    def __init__(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.chunks = 0
+
+    def write(self, frames):
+        """Writes one chunk of frames to a new file.
+
+        Args:
+            frames (numpy array): A uint8 array of RGB frames.
+        """
+        path = os.path.join(self.directory, f"frames-{self.chunks:06d}.npz")
+        np.savez_compressed(path, frames=frames)
+        self.chunks += 1
+
+    def close(self):
+        """Does nothing, since every file is closed once it is written."""
+
+
+class PipeSink:
+    """Class used to write frames as raw RGB24 bytes, one frame after
+    another, to a binary stream such as a pipe.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, frames):
+        """Writes one chunk of frames to the stream.
+
+        Args:
+            frames (numpy array): A uint8 array of RGB frames.
+        """
+        self.stream.write(np.ascontiguousarray(frames).data)
+
+    def close(self):
+        """Flushes the stream."""
+        self.stream.flush()
+
+
+class FrameCapture:
+    """Class used to copy frames out of a surface and stream them to a sink
+    without waiting on the sink.
+
+    The ring buffer holds RING_CHUNKS chunks of CHUNK_FRAMES frames each, in
+    the surface's own 32-bit pixel format. Once a chunk is full it is
+    queued for the writer thread, and capturing moves on to the next free
+    chunk. If the writer falls so far behind that no chunk is free, capture
+    waits for one when block is True, and otherwise drops the frame and
+    counts it in dropped.
+    """
+
+    def __init__(self, surface, sink, chunk_frames=CHUNK_FRAMES,
+                 chunks=RING_CHUNKS, block=True):
+        if surface.get_bytesize() != 4:
+            raise ValueError("Frames can only be captured from 32-bit "
+                             "surfaces")
+        width, height = surface.get_size()
+        self.sink = sink
+        self.block = block
+        self.ring = np.empty((chunks, chunk_frames, height, width),
+                             dtype=np.uint32)
+        # The byte of each pixel holding red, green and blue.
+        self.channels = [shift // 8 if sys.byteorder == "little"
+                         else 3 - shift // 8
+                         for shift in surface.get_shifts()[:3]]
+        self.free = queue.Queue()
+        for chunk in range(chunks):
+            self.free.put(chunk)
+        self.full = queue.Queue()
+        self.chunk = None
+        self.position = 0
+        self.captured = 0
+        self.dropped = 0
+        self.error = None
+        self.writer = threading.Thread(target=self.write_chunks, daemon=True)
+        self.writer.start()
+
+    def capture(self, surface):
+        """Copies the pixels of a surface into the ring buffer.
+
+        Args:
+            surface (pygame surface): The surface to copy, the same size and
+                pixel format as the one the capture was created with.
+
+        Returns:
+            bool: False if the frame was dropped.
+        """
+        if self.chunk is None:
+            try:
+                self.chunk = self.free.get(block=self.block)
+            except queue.Empty:
+                self.dropped += 1
+                return False
+            self.position = 0
+        # pixels2d is a view of the surface's pixels, indexed by x and then
+        # y, so its transpose has the same layout as a frame in the ring.
+        np.copyto(self.ring[self.chunk, self.position],
+                  pygame.surfarray.pixels2d(surface).T)
+        self.position += 1
+        self.captured += 1
+        if self.position == self.ring.shape[1]:
+            self.full.put((self.chunk, self.position))
+            self.chunk = None
+        return True
+
+    def write_chunks(self):
+        """Runs in the writer thread, converting full chunks to RGB and
+        writing them to the sink until close is called.
+        """
+        while True:
+            item = self.full.get()
+            if item is None:
+                break
+            chunk, count = item
+            try:
+                if self.error is None:
+                    pixels = self.ring[chunk, :count].view(np.uint8)
+                    pixels = pixels.reshape(pixels.shape[:-1] + (-1, 4))
+                    self.sink.write(pixels[..., self.channels])
+            except Exception as error:
+                self.error = error
+            self.free.put(chunk)
+
+    def close(self):
+        """Writes any frames left in the ring, waits for the writer thread to
+        finish and closes the sink.
+
+        Raises:
+            Exception: Whatever the sink raised, if writing failed.
+        """
+        if self.chunk is not None and self.position:
+            self.full.put((self.chunk, self.position))
+            self.chunk = None
+        self.full.put(None)
+        self.writer.join()
+        self.sink.close()
+        if self.error is not None:
+            raise self.error
+
+
+def capture_game(capture, replay=None, seed=None, max_pieces=None):
+    """Plays a game headless and captures a frame after every tick.
+
+    Args:
+        capture (FrameCapture): Where to capture the frames to.
+        replay (Replay): A replay to play back. If none is given, a game is
+            played by bot.Bot instead, one move per tick, so every
+            Tetromino is seen moving into place and falling.
+        seed (int): The seed of the bot's game.
+        max_pieces (int): Stops the bot's game after this many Tetrominos.
+
+    Returns:
+        Game: The game, as it was after the last frame.
+    """
+    window = pygame.display.get_surface()
+    columns, rows = ((replay.columns, replay.rows) if replay is not None
+                     else (tetros.BOARD_COLUMNS, tetros.BOARD_ROWS))
+    renderer = tetros.Renderer(window, columns, rows)
+
+    def draw(game):
+        renderer.draw(game)
+        capture.capture(window)
+
+    if replay is not None:
+        return play(replay, on_tick=draw)
+
+    from bot import Bot
+    bot = Bot(workers=0)
+    game = Game(columns, rows, seed)
+    pieces = 0
+    while not game.over:
+        if game.current is not bot.tetromino:
+            if max_pieces is not None and pieces >= max_pieces:
+                break
+            pieces += 1
+        bot.step(game)
+        game.tick()
+        draw(game)
+    return game
+
+
+def main():
+    """Captures a game from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--replay", help="a replay file to play back")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--pieces", type=int, default=100,
+                        help="how many pieces the bot plays, without a replay")
+    output = parser.add_mutually_exclusive_group(required=True)
+    output.add_argument("--npz", metavar="DIRECTORY",
+                        help="write compressed chunks to this directory")
+    output.add_argument("--raw", action="store_true",
+                        help="write raw RGB24 frames to stdout")
+    args = parser.parse_args()
+
+    window = tetros.startup()
+    sink = (NpzSink(args.npz) if args.npz
+            else PipeSink(sys.stdout.buffer))
+    capture = FrameCapture(window, sink)
+    replay = Replay.load(args.replay) if args.replay else None
+    try:
+        capture_game(capture, replay, args.seed, args.pieces)
+    finally:
+        capture.close()
+    print(f"Captured {capture.captured} frames of "
+          f"{window.get_width()}x{window.get_height()}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
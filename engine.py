@@ -0,0 +1,1020 @@
+#! python3
+"""The rules of Tetros, without any dependency on pygame.
+
+Everything in this module works in board cells rather than pixels, so it can
+be imported and run headless. tetros.py only draws the state kept here.
+"""
+
+import random
+import time
+from collections import namedtuple
+
+
+# GLOBAL CONSTANTS
+
+COLUMNS = 12
+ROWS = 22
+TICK_RATE = 30
+MAX_TICKS_PER_UPDATE = 10
+DAS_TICKS = 5
+ARR_TICKS = 1
+
+# PLAYER INPUTS
+
+NOOP = 0
+LEFT = 1
+RIGHT = 2
+ROTATE = 3
+ROTATE_CC = 4
+DROP = 5
+HARD_DROP = 6
+FREEZE = 7
+UNFREEZE = 8
+
+# SHAPES
+
+SHAPES = ("I", "O", "T", "S", "Z", "J", "L")
+COLORS = [
+    (0, 255, 255),
+    (255, 255, 0),
+    (128, 0, 128),
+    (0, 128, 0),
+    (255, 0, 0),
+    (0, 0, 255),
+    (255, 165, 0)
+]
+
+# Every shape in its starting rotation, as rows of its bounding box.
+SHAPE_BLOCKS = {
+    "I": ((0, 0, 0, 0),
+          (1, 1, 1, 1),
+          (0, 0, 0, 0),
+          (0, 0, 0, 0)),
+    "O": ((0, 0, 0, 0),
+          (0, 1, 1, 0),
+          (0, 1, 1, 0),
+          (0, 0, 0, 0)),
+    "T": ((0, 1, 0),
+          (1, 1, 1),
+          (0, 0, 0)),
+    "S": ((0, 1, 1),
+          (1, 1, 0),
+          (0, 0, 0)),
+    "Z": ((1, 1, 0),
+          (0, 1, 1),
+          (0, 0, 0)),
+    "J": ((1, 0, 0),
+          (1, 1, 1),
+          (0, 0, 0)),
+    "L": ((0, 0, 0),
+          (1, 1, 1),
+          (1, 0, 0)),
+}
+
+# Super Rotation System wall kicks, as (columns, rows) offsets with rows
+# counted downwards, keyed by (from state, to state). State 0 is the
+# standard spawn orientation and states count clockwise.
+JLSTZ_KICKS = {
+    (0, 1): ((0, 0), (-1, 0), (-1, -1), (0, 2), (-1, 2)),
+    (1, 0): ((0, 0), (1, 0), (1, 1), (0, -2), (1, -2)),
+    (1, 2): ((0, 0), (1, 0), (1, 1), (0, -2), (1, -2)),
+    (2, 1): ((0, 0), (-1, 0), (-1, -1), (0, 2), (-1, 2)),
+    (2, 3): ((0, 0), (1, 0), (1, -1), (0, 2), (1, 2)),
+    (3, 2): ((0, 0), (-1, 0), (-1, 1), (0, -2), (-1, -2)),
+    (3, 0): ((0, 0), (-1, 0), (-1, 1), (0, -2), (-1, -2)),
+    (0, 3): ((0, 0), (1, 0), (1, -1), (0, 2), (1, 2)),
+}
+I_KICKS = {
+    (0, 1): ((0, 0), (-2, 0), (1, 0), (-2, 1), (1, -2)),
+    (1, 0): ((0, 0), (2, 0), (-1, 0), (2, -1), (-1, 2)),
+    (1, 2): ((0, 0), (-1, 0), (2, 0), (-1, -2), (2, 1)),
+    (2, 1): ((0, 0), (1, 0), (-2, 0), (1, 2), (-2, -1)),
+    (2, 3): ((0, 0), (2, 0), (-1, 0), (2, -1), (-1, 2)),
+    (3, 2): ((0, 0), (-2, 0), (1, 0), (-2, 1), (1, -2)),
+    (3, 0): ((0, 0), (1, 0), (-2, 0), (1, 2), (-2, -1)),
+    (0, 3): ((0, 0), (-1, 0), (2, 0), (-1, -2), (2, 1)),
+}
+# Tetros spawns the L upside down compared to the standard orientation.
+SPAWN_STATES = {"L": 2}
+
+Rotation = namedtuple("Rotation", ["cells", "size", "left", "right",
+                                   "top", "bottom"])
+
+
+def build_rotations(blocks):
+    """Precomputes the four rotations of a shape.
+
+    Args:
+        blocks (tuple): The rows of the shape's bounding box in its starting
+            rotation, with a 1 for every square.
+
+    Returns:
+        tuple: One Rotation per clockwise quarter turn, holding the (x, y)
+            offset of every square in the bounding box, the size of the box,
+            and the smallest and largest x and y offsets.
+    """
+    size = len(blocks)
+    rotations = []
+    for _ in range(4):
+        cells = tuple((x, y)
+                      for y in range(size)
+                      for x in range(size)
+                      if blocks[y][x])
+        xs = [x for x, _ in cells]
+        ys = [y for _, y in cells]
+        rotations.append(Rotation(cells, size, min(xs), max(xs),
+                                  min(ys), max(ys)))
+        blocks = tuple(tuple(blocks[size - 1 - y][x] for y in range(size))
+                       for x in range(size))
+    return tuple(rotations)
+
+
+def build_kicks(shape):
+    """Looks up the wall kicks for every rotation of a shape.
+
+    Args:
+        shape (string): One of SHAPES.
+
+    Returns:
+        tuple: For each rotation, a dict mapping the direction of the turn
+            (1 or -1) to the offsets to try, in order.
+    """
+    if shape == "O":
+        return tuple({1: ((0, 0),), -1: ((0, 0),)} for _ in range(4))
+    table = I_KICKS if shape == "I" else JLSTZ_KICKS
+    spawn = SPAWN_STATES.get(shape, 0)
+    return tuple(
+        {direction: table[((rotation + spawn) % 4,
+                           (rotation + direction + spawn) % 4)]
+         for direction in (1, -1)}
+        for rotation in range(4)
+    )
+
+
+ROTATIONS = tuple(build_rotations(SHAPE_BLOCKS[shape]) for shape in SHAPES)
+KICKS = tuple(build_kicks(shape) for shape in SHAPES)
+
+
+class Board:
+    """Class used to store the blocks that have been placed in the play area.
+
+    Each row is stored as a bitmask with one bit per column, so a row is full
+    when its mask equals FULL_ROW. The color of every placed block is kept in
+    a flat bytearray as an index into COLORS, offset by one so that zero can
+    mean the cell is empty. HEIGHTS holds, for every column, the row of its
+    highest placed block, or ROWS if the column is empty, and COUNTS holds
+    the number of blocks in every row.
+    """
+
+    def __init__(self, columns=COLUMNS, rows=ROWS):
+        self.columns = columns
+        self.rows = rows
+        self.full_row = (1 << columns) - 1
+        self.masks = [0] * rows
+        self.colors = bytearray(columns * rows)
+        self.heights = [rows] * columns
+        self.counts = [0] * rows
+        self.topped_out = False
+
+    def copy(self):
+        """Creates a copy of the board that can be changed without changing
+        this one.
+
+        Returns:
+            Board: The copy.
+        """
+        board = Board.__new__(Board)
+        board.columns = self.columns
+        board.rows = self.rows
+        board.full_row = self.full_row
+        board.masks = self.masks[:]
+        board.colors = self.colors[:]
+        board.heights = self.heights[:]
+        board.counts = self.counts[:]
+        board.topped_out = self.topped_out
+        return board
+
+    def is_occupied(self, column, row):
+        """Checks whether a cell is blocked by a wall, the floor, or a placed
+        block. Cells above the top of the play area are only blocked by the
+        walls.
+
+        Args:
+            column (int): The column of the cell, counted from the left.
+            row (int): The row of the cell, counted from the top.
+
+        Returns:
+            bool: True if a block cannot be moved into the cell.
+        """
+        if column < 0 or column >= self.columns or row >= self.rows:
+            return True
+        if row < 0:
+            return False
+        return bool(self.masks[row] >> column & 1)
+
+    def place(self, cells, color):
+        """Fixes a set of cells in place on the board.
+
+        Args:
+            cells (iterable): (column, row) pairs of the blocks to place.
+            color (int): The index into COLORS of the blocks' color.
+        """
+        color_index = color + 1
+        for column, row in cells:
+            if row < 0:
+                self.topped_out = True
+                continue
+            if not self.masks[row] >> column & 1:
+                self.counts[row] += 1
+            self.masks[row] |= 1 << column
+            self.colors[row * self.columns + column] = color_index
+            if row < self.heights[column]:
+                self.heights[column] = row
+
+    def color(self, column, row):
+        """Looks up the color of a placed block.
+
+        Args:
+            column (int): The column of the cell, counted from the left.
+            row (int): The row of the cell, counted from the top.
+
+        Returns:
+            tuple: The RGB color of the block, or None if the cell is empty.
+        """
+        color_index = self.colors[row * self.columns + column]
+        return COLORS[color_index - 1] if color_index else None
+
+    def full_rows(self, rows=None):
+        """Finds the full rows among some rows of the board.
+
+        Args:
+            rows (iterable): The rows to check, for example the rows a
+                Tetromino was just placed in. Every row is checked if none
+                are given.
+
+        Returns:
+            list: The indexes of the full rows, from top to bottom.
+        """
+        columns = self.columns
+        if rows is None:
+            return [row for row, count in enumerate(self.counts)
+                    if count == columns]
+        return sorted({row for row in rows
+                       if 0 <= row < self.rows
+                       and self.counts[row] == columns})
+
+    def remove_rows(self, full):
+        """Removes rows and moves the rows above them down, in one pass from
+        the lowest removed row up to the top of the stack.
+
+        Args:
+            full (list): The indexes of the rows to remove, from top to
+                bottom, as returned by full_rows.
+        """
+        if not full:
+            return
+        columns = self.columns
+        masks = self.masks
+        counts = self.counts
+        colors = self.colors
+        removed = set(full)
+        write = full[-1]
+        top = -1
+        for read in range(full[-1] - 1, -1, -1):
+            if read in removed:
+                continue
+            # Every block rests on another one, so once an empty row is
+            # reached, every row above it is empty too.
+            if not masks[read]:
+                top = read
+                break
+            masks[write] = masks[read]
+            counts[write] = counts[read]
+            colors[write * columns:(write + 1) * columns] = \
+                colors[read * columns:(read + 1) * columns]
+            write -= 1
+        for row in range(top + 1, write + 1):
+            masks[row] = 0
+            counts[row] = 0
+            colors[row * columns:(row + 1) * columns] = bytes(columns)
+        self.update_heights()
+
+    def clear_lines(self, rows=None):
+        """Removes every full row and moves the rows above it down.
+
+        Args:
+            rows (iterable): Only these rows can be full, for example the
+                rows a Tetromino was just placed in. Every row is checked if
+                none are given.
+
+        Returns:
+            int: The number of rows that were cleared.
+        """
+        full = self.full_rows(rows)
+        self.remove_rows(full)
+        return len(full)
+
+    def update_heights(self):
+        """Recomputes the height of every column from the row masks.
+        """
+        heights = [self.rows] * self.columns
+        remaining = self.full_row
+        for row, mask in enumerate(self.masks):
+            found = mask & remaining
+            while found:
+                lowest = found & -found
+                heights[lowest.bit_length() - 1] = row
+                found ^= lowest
+            remaining &= ~mask
+            if not remaining:
+                break
+        self.heights = heights
+
+    def blocks(self):
+        """Yields every placed block on the board.
+
+        Yields:
+            tuple: The column, row, and RGB color of a placed block.
+        """
+        columns = self.columns
+        for row, mask in enumerate(self.masks):
+            if not mask:
+                continue
+            for column in range(columns):
+                if mask >> column & 1:
+                    yield column, row, COLORS[
+                        self.colors[row * columns + column] - 1]
+
+
+class Tetromino:
+    """Class used to create Tetromino objects
+
+    Returns:
+        [Tetromino object]:
+        [has a shape, a rotation, a position on the board,
+        and functions associated with
+        moving the object.]
+    """
+
+    DROP_RATE = 5
+
+    __slots__ = ("shape", "shape_index", "rotation", "left", "top",
+                 "falling", "tick_count", "drop_rate", "color")
+
+    def __init__(self, shape, columns=COLUMNS):
+        self.shape = shape
+        self.shape_index = SHAPES.index(shape)
+        self.rotation = 0
+        self.falling = True
+        self.tick_count = 0
+        self.drop_rate = self.DROP_RATE
+        if self.shape == "I" or self.shape == "O":
+            self.left = columns // 2 - 2
+            self.top = -3
+        else:
+            self.left = columns // 2 - 1
+            self.top = -5
+        self.color = COLORS[self.shape_index]
+
+    @property
+    def state(self):
+        """Rotation: The precomputed cells and bounds of the Tetromino in its
+        current rotation."""
+        return ROTATIONS[self.shape_index][self.rotation]
+
+    def turn(self, direction, board=None):
+        """Rotates the Tetromino by a quarter turn.
+
+        When a board is given, the rotation is tried at each offset in the
+        wall kick table in turn and the first one that doesn't overlap a
+        wall, the floor or a placed block is used. If none fit, the
+        Tetromino is left as it was.
+
+        Args:
+            direction (int): 1 to turn clockwise, -1 to turn counterclockwise.
+            board (Board): The board to check the rotation against.
+
+        Returns:
+            bool: True if the Tetromino was rotated.
+        """
+        rotation = (self.rotation + direction) % 4
+        if board is None:
+            self.rotation = rotation
+            return True
+        for columns, rows in KICKS[self.shape_index][self.rotation][direction]:
+            left = self.left + columns
+            top = self.top + rows
+            if self.fits(board, left, top, rotation):
+                self.rotation = rotation
+                self.left = left
+                self.top = top
+                return True
+        return False
+
+    def fits(self, board, left, top, rotation):
+        """Checks whether the Tetromino could be at a given position without
+        overlapping a wall, the floor, or a placed block.
+
+        Args:
+            board (Board): The board holding every placed block.
+            left (int): The column of the Tetromino's bounding box.
+            top (int): The row of the Tetromino's bounding box.
+            rotation (int): The rotation of the Tetromino, from 0 to 3.
+
+        Returns:
+            bool: True if every square of the Tetromino would be free.
+        """
+        for x, y in ROTATIONS[self.shape_index][rotation].cells:
+            if board.is_occupied(left + x, top + y):
+                return False
+        return True
+
+    def rotate(self, board=None):
+        """Rotates the Tetromino clockwise
+
+        Args:
+            board (Board): The board to check the rotation against.
+        """
+        return self.turn(1, board)
+
+    def rotate_cc(self, board=None):
+        """Rotates the Tetromino counterclockwise
+
+        Args:
+            board (Board): The board to check the rotation against.
+        """
+        return self.turn(-1, board)
+
+    def cells(self, columns=0, rows=0):
+        """Returns the board cells covered by the Tetromino.
+
+        Args:
+            columns (int): Number of columns to offset the cells by.
+            rows (int): Number of rows to offset the cells by.
+
+        Returns:
+            list: (column, row) pairs for every square of the Tetromino.
+        """
+        left = self.left + columns
+        top = self.top + rows
+        return [(left + x, top + y) for x, y in self.state.cells]
+
+    def landed(self, board):
+        """Checks whether the Tetromino is resting on the floor or on a
+        placed block.
+
+        Args:
+            board (Board): The board holding every placed block.
+
+        Returns:
+            bool: True if the Tetromino cannot fall any further.
+        """
+        return not self.fits(board, self.left, self.top + 1, self.rotation)
+
+    def fall(self, level):
+        """Makes the Tetromino fall over time.
+
+        Args:
+            level (int): The current level that the player is on,
+            based on the number of rows they have cleared. At higher levels,
+            the Tetrominos will fall faster.
+        """
+        if self.falling == True:
+            self.tick_count += (level / 2)
+            if self.tick_count > self.drop_rate:
+                self.top += 1
+                self.tick_count = 0
+
+    def drop(self):
+        """Drops the Tetromino much more quickly than normal.
+        """
+        self.drop_rate = 0.5
+
+    def drop_distance(self, board):
+        """Finds how many rows the Tetromino can fall before it lands.
+
+        While every square is above the highest block in its column, the
+        distance comes straight from the board's height map. A Tetromino
+        that has been slid under an overhang is moved down one row at a time
+        instead.
+
+        Args:
+            board (Board): The board holding every placed block.
+
+        Returns:
+            int: The number of rows between the Tetromino and where it
+                would land.
+        """
+        distance = board.rows - self.top
+        heights = board.heights
+        for x, y in self.state.cells:
+            gap = heights[self.left + x] - 1 - (self.top + y)
+            if gap < distance:
+                distance = gap
+        if distance < 0:
+            distance = 0
+            while self.fits(board, self.left, self.top + distance + 1,
+                            self.rotation):
+                distance += 1
+        return distance
+
+    def hard_drop(self, board):
+        """Moves the Tetromino straight to where it would land, so it is
+        locked on the next tick.
+
+        Args:
+            board (Board): The board holding every placed block.
+        """
+        self.top += self.drop_distance(board)
+
+    def shift(self, direction, board):
+        """Shifts the Tetromino one column to the left or right.
+
+        Args:
+            direction (string): A string telling the function which direction
+            the user input specifies the Tetromino should move.
+            board (Board): The board holding every block already placed on
+                the level from pieces that have already fallen and become
+                fixed in place, but haven't been cleared by completing a row.
+        """
+        offset = -1 if direction == "left" else 1
+        if self.fits(board, self.left + offset, self.top, self.rotation):
+            self.left += offset
+
+
+class Bag:
+    """Class used to deal shapes one bag at a time. Every bag holds each of
+    SHAPES once, in an order shuffled by a generator seeded with the bag's
+    seed and number, so the same seed always deals the same sequence of
+    shapes. Since a bag's order only depends on its number, the position in
+    the sequence is a single int that can be saved and restored.
+
+    Bags are iterators, so next(bag) deals the next shape.
+    """
+
+    __slots__ = ("seed", "dealt", "number", "order")
+
+    def __init__(self, seed=None, dealt=0):
+        self.seed = random.getrandbits(64) if seed is None else seed
+        self.dealt = dealt
+        self.number = None
+        self.order = None
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        number, position = divmod(self.dealt, len(SHAPES))
+        if number != self.number:
+            self.order = list(SHAPES)
+            random.Random(f"{self.seed}:{number}").shuffle(self.order)
+            self.number = number
+        self.dealt += 1
+        return self.order[position]
+
+
+GameState = namedtuple("GameState", [
+    "seed", "dealt", "masks", "colors", "heights", "counts", "topped_out",
+    "piece", "next_shape", "score", "level", "level_progress", "ticks", "over"
+])
+GameState.__doc__ = """An immutable copy of everything that makes up a Game,
+from Game.snapshot. The board's rows are kept as a tuple of row masks and
+its colors as bytes, and the current Tetromino as a tuple of its shape,
+rotation, left, top, falling, tick_count and drop_rate."""
+
+Spawn = namedtuple("Spawn", ["tick", "shape"])
+Spawn.__doc__ = """Sent to a Game's listeners when a Tetromino enters the
+play area, with the tick it happened on and the Tetromino's shape."""
+
+Lock = namedtuple("Lock", ["tick", "shape", "rotation", "left", "top"])
+Lock.__doc__ = """Sent to a Game's listeners when a Tetromino is locked in
+place, with the tick it happened on and where the Tetromino ended up."""
+
+LineClear = namedtuple("LineClear", ["tick", "rows", "score"])
+LineClear.__doc__ = """Sent to a Game's listeners when rows are cleared,
+with the tick it happened on, the indexes of the cleared rows as they were
+before the rows above moved down, and the points scored for them."""
+
+LevelUp = namedtuple("LevelUp", ["tick", "level"])
+LevelUp.__doc__ = """Sent to a Game's listeners when the level goes up,
+with the tick it happened on and the new level."""
+
+GameOver = namedtuple("GameOver", ["tick", "score", "level"])
+GameOver.__doc__ = """Sent to a Game's listeners when the stack reaches the
+top, with the tick it happened on and the final score and level."""
+
+
+class Game:
+    """Class used to hold the full state of one game: the board, the bag of
+    upcoming Tetrominos, and the score.
+
+    The game advances one frame each time tick is called. Player input is
+    applied between ticks through rotate, rotate_cc, drop, hard_drop, shift
+    and set_falling, or by passing one of the input constants to apply.
+    While recording is a list, every input is appended to it as a
+    (tick, input) pair. While profiler is set to a profiler.Profiler, the
+    phases of every tick are timed with it. Every function in listeners is
+    called with each event the game sends: Spawn, Lock, LineClear, LevelUp
+    and GameOver.
+    """
+
+    def __init__(self, columns=COLUMNS, rows=ROWS, seed=None):
+        self.columns = columns
+        self.rows = rows
+        self.recording = None
+        self.profiler = None
+        self.listeners = []
+        self.reset(seed)
+
+    def reset(self, seed=None):
+        """Clears the board and score to start a new game.
+
+        Args:
+            seed (int): The seed of the Bag of Tetrominos. A random seed is
+                chosen if none is given, and kept in self.seed so the game
+                can be replayed.
+        """
+        self.shapes = Bag(seed)
+        self.seed = self.shapes.seed
+        self.board = Board(self.columns, self.rows)
+        self.score = 0
+        self.level = 1
+        self.level_progress = 0
+        self.ticks = 0
+        self.over = False
+        self.current = Tetromino(next(self.shapes), self.columns)
+        self.next = Tetromino(next(self.shapes), self.columns)
+        if self.recording is not None:
+            self.recording = []
+        if self.listeners:
+            self.emit(Spawn(self.ticks, self.current.shape))
+
+    def snapshot(self):
+        """Copies the state of the game, for searching ahead, undoing moves,
+        or rolling back. Only the board's rows, a few numbers and the
+        current Tetromino are copied, so taking a snapshot is cheap.
+
+        Returns:
+            GameState: An immutable copy of the game's state.
+        """
+        board = self.board
+        tetromino = self.current
+        return GameState(
+            self.seed, self.shapes.dealt, tuple(board.masks),
+            bytes(board.colors), tuple(board.heights), tuple(board.counts),
+            board.topped_out,
+            (tetromino.shape, tetromino.rotation, tetromino.left,
+             tetromino.top, tetromino.falling, tetromino.tick_count,
+             tetromino.drop_rate),
+            self.next.shape, self.score, self.level, self.level_progress,
+            self.ticks, self.over
+        )
+
+    def restore(self, state):
+        """Puts the game back in a state taken by snapshot. The state can be
+        restored any number of times, into this game or any other game with
+        the same board size.
+
+        Args:
+            state (GameState): The state to restore.
+
+        Raises:
+            ValueError: If the state was taken from a game with a different
+                board size.
+        """
+        board = self.board
+        if (len(state.masks) != board.rows or
+                len(state.colors) != board.rows * board.columns):
+            raise ValueError(
+                "Can't restore a state of a {}x{} board into a {}x{} "
+                "board".format(len(state.heights), len(state.masks),
+                               board.columns, board.rows))
+        if state.seed != self.shapes.seed:
+            self.shapes = Bag(state.seed)
+        self.seed = state.seed
+        self.shapes.dealt = state.dealt
+        board.masks[:] = state.masks
+        board.colors[:] = state.colors
+        board.heights[:] = state.heights
+        board.counts[:] = state.counts
+        board.topped_out = state.topped_out
+        shape, rotation, left, top, falling, tick_count, drop_rate = \
+            state.piece
+        tetromino = Tetromino(shape, self.columns)
+        tetromino.rotation = rotation
+        tetromino.left = left
+        tetromino.top = top
+        tetromino.falling = falling
+        tetromino.tick_count = tick_count
+        tetromino.drop_rate = drop_rate
+        self.current = tetromino
+        self.next = Tetromino(state.next_shape, self.columns)
+        self.score = state.score
+        self.level = state.level
+        self.level_progress = state.level_progress
+        self.ticks = state.ticks
+        self.over = state.over
+
+    def emit(self, event):
+        """Sends an event to every listener.
+
+        Args:
+            event (tuple): The event, one of Spawn, Lock, LineClear,
+                LevelUp or GameOver.
+        """
+        for listener in self.listeners:
+            listener(event)
+
+    def spawn(self):
+        """Makes the next Tetromino the current one and takes a new next
+        Tetromino out of the bag.
+        """
+        self.current = self.next
+        self.next = Tetromino(next(self.shapes), self.columns)
+        if self.listeners:
+            self.emit(Spawn(self.ticks, self.current.shape))
+
+    def apply(self, action):
+        """Applies one player input to the current Tetromino.
+
+        Args:
+            action (int): One of LEFT, RIGHT, ROTATE, ROTATE_CC, DROP,
+                HARD_DROP, FREEZE or UNFREEZE.
+        """
+        if self.recording is not None:
+            self.recording.append((self.ticks, action))
+        tetromino = self.current
+        if action == LEFT:
+            tetromino.shift("left", self.board)
+        elif action == RIGHT:
+            tetromino.shift("right", self.board)
+        elif action == ROTATE:
+            tetromino.rotate(self.board)
+        elif action == ROTATE_CC:
+            tetromino.rotate_cc(self.board)
+        elif action == DROP:
+            tetromino.drop()
+        elif action == HARD_DROP:
+            tetromino.hard_drop(self.board)
+        elif action == FREEZE:
+            tetromino.falling = False
+        elif action == UNFREEZE:
+            tetromino.falling = True
+
+    def rotate(self):
+        """Rotates the current Tetromino clockwise."""
+        self.apply(ROTATE)
+
+    def rotate_cc(self):
+        """Rotates the current Tetromino counterclockwise."""
+        self.apply(ROTATE_CC)
+
+    def drop(self):
+        """Drops the current Tetromino much more quickly than normal."""
+        self.apply(DROP)
+
+    def hard_drop(self):
+        """Moves the current Tetromino straight to where it would land."""
+        self.apply(HARD_DROP)
+
+    def shift(self, direction):
+        """Shifts the current Tetromino one column to the left or right.
+
+        Args:
+            direction (string): Either "left" or "right".
+        """
+        self.apply(LEFT if direction == "left" else RIGHT)
+
+    def set_falling(self, falling):
+        """Freezes or unfreezes the current Tetromino.
+
+        Args:
+            falling (bool): False to stop the Tetromino from falling.
+        """
+        self.apply(UNFREEZE if falling else FREEZE)
+
+    def tick(self):
+        """Advances the game by one frame.
+
+        A Tetromino resting on the floor or the stack is locked in place,
+        full rows are cleared and scored, and finally gravity is applied to
+        the current Tetromino. Only the rows the Tetromino was locked into
+        can have become full, so no other rows are checked.
+
+        Returns:
+            int: The number of rows that were cleared during this frame.
+        """
+        self.ticks += 1
+        rows_cleared = 0
+        profiler = self.profiler
+        tetromino = self.current
+        if tetromino.landed(self.board):
+            cells = tetromino.cells()
+            self.board.place(cells, tetromino.shape_index)
+            if self.listeners:
+                self.emit(Lock(self.ticks, tetromino.shape,
+                               tetromino.rotation, tetromino.left,
+                               tetromino.top))
+            if self.board.topped_out:
+                self.over = True
+                if self.listeners:
+                    self.emit(GameOver(self.ticks, self.score, self.level))
+                return rows_cleared
+            if profiler is not None:
+                profiler.mark("collision")
+            full = self.board.full_rows(row for _, row in cells)
+            self.board.remove_rows(full)
+            rows_cleared = len(full)
+            if profiler is not None:
+                profiler.mark("check_lines")
+            points = get_score(rows_cleared, self.level)
+            self.score += points
+            if full and self.listeners:
+                self.emit(LineClear(self.ticks, tuple(full), points))
+            self.level_progress += rows_cleared
+            if self.level_progress == 10:
+                self.level_progress = 0
+                self.level += 1
+                if self.listeners:
+                    self.emit(LevelUp(self.ticks, self.level))
+            self.spawn()
+        if profiler is not None:
+            profiler.mark("collision")
+
+        self.current.fall(self.level)
+        if profiler is not None:
+            profiler.mark("fall")
+        return rows_cleared
+
+
+class FixedTimestep:
+    """Class used to run the game at a fixed number of ticks per second, no
+    matter how often frames are drawn.
+
+    Real time is added to an accumulator every time advance is called, and
+    whole ticks are taken out of it. The rules always see the same tick
+    length, so the game speed doesn't change when the frame rate does. If
+    more than max_ticks are owed at once, for example after the process was
+    suspended, the extra time is dropped instead of being caught up.
+    """
+
+    def __init__(self, tick_rate=TICK_RATE, max_ticks=MAX_TICKS_PER_UPDATE,
+                 clock=time.perf_counter):
+        self.tick_time = 1 / tick_rate
+        self.max_ticks = max_ticks
+        self.clock = clock
+        self.reset()
+
+    def reset(self):
+        """Starts counting time from now, discarding any time owed, for
+        example after the game has been paused.
+        """
+        self.previous = self.clock()
+        self.accumulator = 0.0
+
+    def advance(self):
+        """Adds the time since the last call to the accumulator.
+
+        Returns:
+            int: The number of ticks that should be run now.
+        """
+        now = self.clock()
+        self.accumulator += now - self.previous
+        self.previous = now
+        ticks = int(self.accumulator / self.tick_time)
+        if ticks > self.max_ticks:
+            self.accumulator = 0.0
+            return self.max_ticks
+        self.accumulator -= ticks * self.tick_time
+        return ticks
+
+    @property
+    def time_to_next_tick(self):
+        """float: The number of seconds until the next tick is due."""
+        elapsed = self.accumulator + self.clock() - self.previous
+        return max(0.0, self.tick_time - elapsed)
+
+    @property
+    def alpha(self):
+        """float: How far the current time is between the last tick and the
+        next one, from 0 to 1, for interpolating what is drawn."""
+        return self.accumulator / self.tick_time
+
+
+class AutoShift:
+    """Class used to keep shifting the current Tetromino while left or right
+    is held, with a delayed auto-shift (DAS) and an auto-repeat rate (ARR)
+    counted in ticks, so holding a key behaves the same at any frame rate.
+
+    The first shift is made by the caller when the key is pressed. Once the
+    key has been held for delay ticks the Tetromino shifts again, and then
+    every repeat ticks, or straight to the wall if repeat is 0. If both
+    directions are held, the one pressed last wins.
+    """
+
+    def __init__(self, delay=DAS_TICKS, repeat=ARR_TICKS):
+        self.delay = delay
+        self.repeat = repeat
+        self.held = []
+        self.charge = 0
+
+    @property
+    def direction(self):
+        """int: LEFT or RIGHT, whichever was pressed last and is still held,
+        or NOOP if neither is."""
+        return self.held[-1] if self.held else NOOP
+
+    def press(self, action):
+        """Starts charging the delayed auto-shift for a direction.
+
+        Args:
+            action (int): LEFT or RIGHT.
+        """
+        if action in self.held:
+            self.held.remove(action)
+        self.held.append(action)
+        self.charge = 0
+
+    def release(self, action):
+        """Stops repeating a direction. If the other direction is still held,
+        it starts charging again from the beginning.
+
+        Args:
+            action (int): LEFT or RIGHT.
+        """
+        if action in self.held:
+            self.held.remove(action)
+            self.charge = 0
+
+    def reset(self):
+        """Forgets every held direction, for example after the game was
+        paused and key releases may have been missed.
+        """
+        self.held.clear()
+        self.charge = 0
+
+    def update(self, columns=COLUMNS):
+        """Advances the held direction's charge by one tick.
+
+        Args:
+            columns (int): The width of the board, the most shifts that can
+                be needed to reach a wall.
+
+        Returns:
+            int: The number of times to shift in self.direction this tick.
+        """
+        if not self.held:
+            return 0
+        self.charge += 1
+        if self.charge < self.delay:
+            return 0
+        if self.repeat == 0:
+            return columns
+        if (self.charge - self.delay) % self.repeat == 0:
+            return 1
+        return 0
+
+
+def check_lines(board, rows=None):
+    """Checks to see if the placed blocks create a full row, and clears any
+    full rows that are found.
+
+    Args:
+        board (Board): The board holding every block already placed on the
+            level from pieces that have already fallen and become fixed in
+            place, but haven't been cleared by completing a row.
+        rows (iterable): Only these rows can be full, for example the rows
+            the last Tetromino was placed in. Every row is checked if none
+            are given.
+
+    Returns:
+        board (Board): The same board, with any full rows removed.
+        rows_cleared (int): The number of rows that were cleared during the
+            calling of this function.
+    """
+    rows_cleared = board.clear_lines(rows)
+    return board, rows_cleared
+
+
+def get_score(rows_cleared, level):
+    """Returns a value to add to the score after a row has been cleared.
+
+    Args:
+        rows_cleared (int): The number of rows cleared the last time the
+            check_lines function was called.
+        level (int): The player's current level.
+
+    Returns:
+        int: A number of points to be added to the score based on the
+            number of rows cleared and the current level.
+    """
+    if rows_cleared == 0:
+        return 0
+    elif rows_cleared == 1:
+        return 100 * level
+    elif rows_cleared == 2:
+        return 300 * level
+    elif rows_cleared == 3:
+        return 500 * level
+    elif rows_cleared == 4:
+        return 800 * level
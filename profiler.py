@@ -0,0 +1,233 @@
+#! python3
+"""Times the phases of every frame of Tetros, to find where a slow frame
+went.
+
+A Profiler keeps the time spent in each phase of the most recent frames in
+a ring buffer. The game loop and the code it calls mark the end of each
+phase with Profiler.mark, which returns straight away while the Profiler
+is disabled, so the hooks can stay in place at no real cost. The recorded
+frames can be summarized as percentiles, or written out as CSV or as a
+Chrome trace, which chrome://tracing and Perfetto can open.
+
+A LatencyMeter measures input lag: the time from reading a key press until
+the frame drawn after it is on screen.
+"""
+
+import collections
+import csv
+import json
+import time
+
+
+PHASES = ("events", "bot", "collision", "check_lines", "fall", "draw",
+          "display")
+PROFILE_FRAMES = 300
+LATENCY_SAMPLES = 300
+
+
+def percentile(values, fraction):
+    """Finds a percentile of some values with the nearest rank method.
+
+    Args:
+        values (list): The values. They don't have to be sorted.
+        fraction (float): The percentile, from 0 to 1.
+
+    Returns:
+        float: The value at that percentile, or 0 if there are no values.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class Profiler:
+    """Class used to record how long each phase of recent frames took.
+
+    Each frame is started with start_frame and finished with end_frame.
+    In between, every call to mark adds the time since the previous mark to
+    a phase, so a phase can be marked several times in one frame, for
+    example once for every tick run during it. Only the last `frames`
+    frames are kept; older ones are overwritten.
+    """
+
+    def __init__(self, frames=PROFILE_FRAMES, phases=PHASES,
+                 clock=time.perf_counter):
+        self.enabled = False
+        self.frames = frames
+        self.phases = phases
+        self.clock = clock
+        self.index = {phase: i for i, phase in enumerate(phases)}
+        self.starts = [0.0] * frames
+        self.totals = [0.0] * frames
+        self.times = [[0.0] * len(phases) for _ in range(frames)]
+        self.current = self.times[0]
+        self.count = 0
+        self.last = 0.0
+
+    def clear(self):
+        """Forgets every recorded frame."""
+        self.count = 0
+
+    def start_frame(self):
+        """Starts timing a frame. Calling it again before end_frame starts
+        the same frame over, for example to leave out time spent paused.
+        """
+        if not self.enabled:
+            return
+        slot = self.count % self.frames
+        self.current = self.times[slot]
+        self.current[:] = [0.0] * len(self.phases)
+        self.last = self.starts[slot] = self.clock()
+
+    def mark(self, phase):
+        """Adds the time since the last mark, or since the frame started, to
+        a phase.
+
+        Args:
+            phase (string): One of the Profiler's phases.
+        """
+        if not self.enabled:
+            return
+        now = self.clock()
+        self.current[self.index[phase]] += now - self.last
+        self.last = now
+
+    def end_frame(self):
+        """Finishes timing a frame and stores it in the ring buffer."""
+        if not self.enabled:
+            return
+        slot = self.count % self.frames
+        self.totals[slot] = self.clock() - self.starts[slot]
+        self.count += 1
+
+    def recorded(self):
+        """Lists the recorded frames, oldest first.
+
+        Returns:
+            list: A (start, total, times) tuple for every frame, where start
+                is the clock reading when the frame started, total is the
+                length of the whole frame, and times holds the time spent in
+                each phase, in seconds.
+        """
+        count = min(self.count, self.frames)
+        first = self.count - count
+        return [(self.starts[i % self.frames], self.totals[i % self.frames],
+                 self.times[i % self.frames])
+                for i in range(first, first + count)]
+
+    def summary(self):
+        """Summarizes the recorded frames.
+
+        Returns:
+            dict: The 50th and 99th percentile, in milliseconds, of every
+                phase and of the whole frame, keyed by name.
+        """
+        frames = self.recorded()
+        columns = list(zip(*[times for _, _, times in frames])) or \
+            [()] * len(self.phases)
+        columns.append([total for _, total, _ in frames])
+        return {name: (percentile(values, 0.5) * 1000,
+                       percentile(values, 0.99) * 1000)
+                for name, values in zip(self.phases + ("frame",), columns)}
+
+    def write_csv(self, path):
+        """Writes the recorded frames to a CSV file, one row per frame, with
+        times in milliseconds.
+
+        Args:
+            path (string): The path of the file to write.
+        """
+        with open(path, "w", newline="") as csv_file:
+            writer = csv.writer(csv_file)
+            writer.writerow(("start",) + self.phases + ("frame",))
+            for start, total, times in self.recorded():
+                writer.writerow([f"{start:.6f}"] +
+                                [f"{value * 1000:.3f}" for value in times] +
+                                [f"{total * 1000:.3f}"])
+
+    def write_trace(self, path):
+        """Writes the recorded frames to a file in the Chrome trace event
+        format. The phases of a frame are laid out one after another, in
+        the order of self.phases, each as long as the total time spent in
+        it during the frame.
+
+        Args:
+            path (string): The path of the file to write.
+        """
+        events = []
+        for frame, (start, total, times) in enumerate(self.recorded()):
+            timestamp = start * 1e6
+            events.append({"name": "frame", "ph": "X", "pid": 1, "tid": 1,
+                           "ts": timestamp, "dur": total * 1e6,
+                           "args": {"frame": frame}})
+            for phase, value in zip(self.phases, times):
+                if value:
+                    events.append({"name": phase, "ph": "X", "pid": 1,
+                                   "tid": 1, "ts": timestamp,
+                                   "dur": value * 1e6})
+                    timestamp += value * 1e6
+        with open(path, "w") as trace_file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"},
+                      trace_file)
+
+
+class LatencyMeter:
+    """Class used to measure how long key presses take to show on screen.
+
+    press is called when a key press is read, and then either displayed
+    once the frame that handled it has been handed to the display, or
+    skipped if that frame changed nothing on screen, in which case the
+    press isn't measured. If several keys are pressed before a frame is
+    shown, only the first is measured, since it waited the longest. The
+    last `samples` measurements are kept.
+    """
+
+    def __init__(self, samples=LATENCY_SAMPLES, clock=time.perf_counter):
+        self.clock = clock
+        self.latencies = collections.deque(maxlen=samples)
+        self.pressed_at = None
+
+    def press(self):
+        """Records that a key press was just read."""
+        if self.pressed_at is None:
+            self.pressed_at = self.clock()
+
+    def displayed(self):
+        """Records that a frame was just shown, ending the measurement of
+        the key press waiting for it, if there is one.
+        """
+        if self.pressed_at is not None:
+            self.latencies.append(self.clock() - self.pressed_at)
+            self.pressed_at = None
+
+    def skipped(self):
+        """Records that a frame was drawn without changing anything on
+        screen, dropping the key press waiting for it, if there is one,
+        since nothing shows when it took effect.
+        """
+        self.pressed_at = None
+
+    def summary(self):
+        """Summarizes the measured key presses.
+
+        Returns:
+            tuple: The 50th and 99th percentile of the latency, in
+                milliseconds.
+        """
+        latencies = list(self.latencies)
+        return (percentile(latencies, 0.5) * 1000,
+                percentile(latencies, 0.99) * 1000)
+
+    def write_csv(self, path):
+        """Writes the measured latencies to a CSV file, in milliseconds,
+        oldest first.
+
+        Args:
+            path (string): The path of the file to write.
+        """
+        with open(path, "w", newline="") as csv_file:
+            writer = csv.writer(csv_file)
+            writer.writerow(("input_latency",))
+            for latency in self.latencies:
+                writer.writerow((f"{latency * 1000:.3f}",))
@@ -0,0 +1,208 @@
+#! python3
+"""Records games of Tetros and plays them back headless.
+
+A replay only stores the seed of the game's bag of Tetrominos and every
+input with the tick it was applied on, since the rules in engine.py are
+deterministic given those. The binary format is:
+
+    magic         4 bytes   b"TRPL"
+    version       1 byte
+    columns       2 bytes   unsigned, big endian
+    rows          2 bytes   unsigned, big endian
+    seed          8 bytes   unsigned, big endian
+    ticks         varint    the number of ticks the game lasted
+    count         varint    the number of inputs
+    inputs        count times:
+        delta     varint    ticks since the previous input
+        input     1 byte    one of the input constants in engine.py
+
+Varints use 7 bits per byte, least significant group first, with the high
+bit set on every byte but the last.
+"""
+
+import struct
+
+from engine import COLUMNS, ROWS, Game
+
+
+MAGIC = b"TRPL"
+VERSION = 1
+HEADER = struct.Struct(">4sBHHQ")
+
+
+def write_varint(buffer, value):
+    """Appends an unsigned integer to a buffer as a varint.
+
+    Args:
+        buffer (bytearray): The buffer to append to.
+        value (int): The integer to write.
+    """
+    while value > 0x7F:
+        buffer.append(value & 0x7F | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+
+def read_varint(data, offset):
+    """Reads a varint from a buffer.
+
+    Args:
+        data (bytes): The buffer to read from.
+        offset (int): The position of the varint's first byte.
+
+    Returns:
+        tuple: The integer that was read and the position after it.
+    """
+    value = 0
+    shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+class Replay:
+    """Class used to hold a recorded game.
+
+    Attributes:
+        seed (int): The seed of the game's bag of Tetrominos.
+        inputs (list): (tick, input) pairs, in the order they were applied.
+        ticks (int): The number of ticks the game lasted.
+        columns (int): The width of the board.
+        rows (int): The height of the board.
+    """
+
+    def __init__(self, seed, inputs=(), ticks=0, columns=COLUMNS, rows=ROWS):
+        self.seed = seed
+        self.inputs = list(inputs)
+        self.ticks = ticks
+        self.columns = columns
+        self.rows = rows
+
+    @classmethod
+    def from_game(cls, game):
+        """Creates a replay of a game that was being recorded.
+
+        Args:
+            game (Game): A game whose recording list was set before it was
+                reset.
+
+        Returns:
+            Replay: The seed, inputs and length of the game so far.
+        """
+        return cls(game.seed, game.recording, game.ticks,
+                   game.columns, game.rows)
+
+    def to_bytes(self):
+        """Encodes the replay in the binary format.
+
+        Returns:
+            bytes: The encoded replay.
+        """
+        buffer = bytearray(HEADER.pack(MAGIC, VERSION, self.columns,
+                                       self.rows, self.seed))
+        write_varint(buffer, self.ticks)
+        write_varint(buffer, len(self.inputs))
+        previous = 0
+        for tick, action in self.inputs:
+            write_varint(buffer, tick - previous)
+            buffer.append(action)
+            previous = tick
+        return bytes(buffer)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Decodes a replay from the binary format.
+
+        Args:
+            data (bytes): The encoded replay.
+
+        Raises:
+            ValueError: If the data is not a replay this version can read.
+
+        Returns:
+            Replay: The decoded replay.
+        """
+        magic, version, columns, rows, seed = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Not a version {} Tetros replay".format(VERSION))
+        offset = HEADER.size
+        ticks, offset = read_varint(data, offset)
+        count, offset = read_varint(data, offset)
+        inputs = []
+        tick = 0
+        for _ in range(count):
+            delta, offset = read_varint(data, offset)
+            tick += delta
+            inputs.append((tick, data[offset]))
+            offset += 1
+        return cls(seed, inputs, ticks, columns, rows)
+
+    def save(self, path):
+        """Writes the replay to a file.
+
+        Args:
+            path (string): The path of the file to write.
+        """
+        with open(path, "wb") as replay_file:
+            replay_file.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path):
+        """Reads a replay from a file.
+
+        Args:
+            path (string): The path of the file to read.
+
+        Returns:
+            Replay: The replay stored in the file.
+        """
+        with open(path, "rb") as replay_file:
+            return cls.from_bytes(replay_file.read())
+
+
+def record(game, seed=None):
+    """Starts a new game and records its inputs.
+
+    Args:
+        game (Game): The game to record. It is reset.
+        seed (int): The seed of the new game's bag, or None for a random one.
+    """
+    game.recording = []
+    game.reset(seed)
+
+
+def play(replay, game=None, on_tick=None):
+    """Plays a replay back as fast as possible, without drawing anything.
+
+    Args:
+        replay (Replay): The replay to play.
+        game (Game): A game with the replay's board size to play the replay
+            in, to avoid creating a new one for every replay. It is reset.
+        on_tick (function): Called with the game after every tick, for
+            example to draw it.
+
+    Returns:
+        Game: The game in the state it was in when the recording ended.
+    """
+    if game is None:
+        game = Game(replay.columns, replay.rows, replay.seed)
+    else:
+        game.reset(replay.seed)
+    inputs = replay.inputs
+    index = 0
+    count = len(inputs)
+    while game.ticks < replay.ticks and not game.over:
+        while index < count and inputs[index][0] == game.ticks:
+            game.apply(inputs[index][1])
+            index += 1
+        game.tick()
+        if on_tick is not None:
+            on_tick(game)
+    while index < count and not game.over:
+        game.apply(inputs[index][1])
+        index += 1
+    return game
@@ -0,0 +1,428 @@
+#! python3
+"""Hosts many headless games of Tetros from one process, for tournaments and
+bots playing against each other.
+
+Every game is a Session. One asyncio task ticks all of them at TICK_RATE,
+so no game needs a thread of its own. Inputs reach a session through an
+in-process queue, either by calling Session.send directly or over a local
+TCP connection. Each connection plays one game:
+
+    client -> server   one line with the seed of the game, from 0 to
+                       2**64 - 1, or an empty line for a random seed, then
+                       one byte per input, each one of CLIENT_INPUTS;
+                       other bytes are ignored
+    server -> client   one line of JSON with the ticks, score, level and
+                       whether the game is over, every time a Tetromino
+                       locks; the connection is closed after the game ends.
+                       If the seed line is not a valid seed, one line of
+                       JSON with an "error" message is sent instead, and
+                       the connection is closed
+
+Run `python server.py` to host games played by random clients and print how
+long ticking them took.
+"""
+
+import argparse
+import asyncio
+import collections
+import itertools
+import json
+import os
+import random
+import time
+
+from engine import (COLUMNS, ROWS, TICK_RATE, Game, FixedTimestep,
+                    LEFT, RIGHT, ROTATE, ROTATE_CC, DROP, HARD_DROP)
+from profiler import percentile
+
+
+HOST = "127.0.0.1"
+PORT = 7474
+MAX_QUEUED_INPUTS = 64
+LATENCY_SAMPLES = 1000
+MAX_SEED = 2 ** 64 - 1
+# FREEZE and UNFREEZE are left out, since a frozen Tetromino would keep a
+# session open forever.
+CLIENT_INPUTS = (LEFT, RIGHT, ROTATE, ROTATE_CC, DROP, HARD_DROP)
+
+
+class Session:
+    """Class used to hold one game hosted by a Server.
+
+    Inputs are queued with send and applied, in order, right before the
+    game's next tick. Only CLIENT_INPUTS are accepted. Past MAX_QUEUED_INPUTS
+    waiting inputs the oldest are dropped, so a flooding client can't make a
+    tick slower. A dict with the game's state is put in updates every time a
+    Tetromino locks and when the game ends.
+    """
+
+    def __init__(self, number, columns=COLUMNS, rows=ROWS, seed=None):
+        self.number = number
+        self.game = Game(columns, rows, seed)
+        self.inputs = collections.deque(maxlen=MAX_QUEUED_INPUTS)
+        self.updates = asyncio.Queue()
+
+    def send(self, action):
+        """Queues an input for the next tick.
+
+        Args:
+            action (int): One of CLIENT_INPUTS. Anything else is ignored.
+
+        Returns:
+            bool: True if the input was queued.
+        """
+        if action not in CLIENT_INPUTS:
+            return False
+        self.inputs.append(action)
+        return True
+
+    def state(self):
+        """Describes the game as it is now.
+
+        Returns:
+            dict: The session number, and the game's ticks, score, level and
+                whether it is over.
+        """
+        game = self.game
+        return {"session": self.number, "ticks": game.ticks,
+                "score": game.score, "level": game.level, "over": game.over}
+
+    def step(self):
+        """Applies the queued inputs and advances the game by one tick.
+
+        Returns:
+            bool: True if the game is over.
+        """
+        game = self.game
+        inputs = self.inputs
+        while inputs:
+            game.apply(inputs.popleft())
+        current = game.current
+        game.tick()
+        if game.over or game.current is not current:
+            self.updates.put_nowait(self.state())
+        return game.over
+
+
+class Server:
+    """Class used to host and tick many Sessions.
+
+    run ticks every open session TICK_RATE times a second, and closes
+    sessions whose game has ended. The time each tick of all sessions took
+    and how late it started are kept for the last LATENCY_SAMPLES ticks.
+    """
+
+    def __init__(self, columns=COLUMNS, rows=ROWS, tick_rate=TICK_RATE):
+        self.columns = columns
+        self.rows = rows
+        self.tick_rate = tick_rate
+        self.sessions = {}
+        self.numbers = itertools.count(1)
+        self.ticks = 0
+        self.finished = 0
+        self.durations = collections.deque(maxlen=LATENCY_SAMPLES)
+        self.delays = collections.deque(maxlen=LATENCY_SAMPLES)
+        self.connections = set()
+        self.running = False
+
+    def open_session(self, seed=None):
+        """Starts a new game.
+
+        Args:
+            seed (int): The seed of the game's bag. A random seed is chosen
+                if none is given.
+
+        Returns:
+            Session: The new session.
+        """
+        session = Session(next(self.numbers), self.columns, self.rows, seed)
+        self.sessions[session.number] = session
+        return session
+
+    def close_session(self, session):
+        """Stops ticking a session, for example when its client leaves.
+
+        Args:
+            session (Session): The session to close.
+        """
+        self.sessions.pop(session.number, None)
+
+    def tick(self):
+        """Advances every open session by one tick, and closes the ones
+        whose game ended.
+        """
+        start = time.perf_counter()
+        ended = [session for session in self.sessions.values()
+                 if session.step()]
+        for session in ended:
+            self.close_session(session)
+        self.finished += len(ended)
+        self.ticks += 1
+        self.durations.append(time.perf_counter() - start)
+
+    async def run(self):
+        """Ticks the sessions at tick_rate until stop is called. If ticking
+        falls behind, as many ticks as are owed, up to the timestep's
+        limit, are run back to back.
+        """
+        self.running = True
+        timestep = FixedTimestep(self.tick_rate)
+        while self.running:
+            delay = timestep.time_to_next_tick
+            deadline = time.perf_counter() + delay
+            await asyncio.sleep(delay)
+            self.delays.append(max(0.0, time.perf_counter() - deadline))
+            for _ in range(timestep.advance()):
+                self.tick()
+
+    def stop(self):
+        """Makes run return after the tick in progress."""
+        self.running = False
+
+    async def listen(self, host=HOST, port=PORT):
+        """Starts accepting games over TCP.
+
+        Args:
+            host (string): The address to listen on.
+            port (int): The port to listen on.
+
+        Returns:
+            asyncio.Server: The listening server. Close it to stop
+                accepting connections.
+        """
+        return await asyncio.start_server(self.handle_connection, host, port)
+
+    async def handle_connection(self, reader, writer):
+        """Hosts one game for a TCP client, as described at the top of this
+        module.
+
+        Args:
+            reader (asyncio.StreamReader): The stream from the client.
+            writer (asyncio.StreamWriter): The stream to the client.
+        """
+        connection = asyncio.current_task()
+        self.connections.add(connection)
+        session = None
+        reading = None
+
+        async def read_inputs():
+            while True:
+                data = await reader.read(MAX_QUEUED_INPUTS)
+                if not data:
+                    break
+                for action in data:
+                    session.send(action)
+
+        try:
+            try:
+                seed = parse_seed(await reader.readline())
+            except ValueError as error:
+                writer.write(json.dumps({"error": str(error)}).encode() +
+                             b"\n")
+                await writer.drain()
+                return
+            session = self.open_session(seed)
+            reading = asyncio.ensure_future(read_inputs())
+            while True:
+                getting = asyncio.ensure_future(session.updates.get())
+                done, _ = await asyncio.wait(
+                    (getting, reading), return_when=asyncio.FIRST_COMPLETED)
+                if getting not in done:
+                    getting.cancel()
+                    break
+                update = getting.result()
+                writer.write(json.dumps(update).encode() + b"\n")
+                await writer.drain()
+                if update["over"]:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            if reading is not None:
+                reading.cancel()
+            if session is not None:
+                self.close_session(session)
+            self.connections.discard(connection)
+            writer.close()
+
+    def metrics(self):
+        """Summarizes how the server is keeping up.
+
+        Returns:
+            dict: The number of open sessions, ticks run and games finished;
+                the 50th and 99th percentile, in milliseconds, of the time
+                a tick of all sessions took and of how late ticks started;
+                and sessions_per_core, the number of sessions one core
+                could tick at tick_rate at the average cost per session.
+        """
+        durations = list(self.durations)
+        delays = list(self.delays)
+        sessions = len(self.sessions)
+        sessions_per_core = 0.0
+        if durations and sessions:
+            per_session = sum(durations) / len(durations) / sessions
+            sessions_per_core = 1 / self.tick_rate / per_session
+        return {
+            "sessions": sessions,
+            "ticks": self.ticks,
+            "finished": self.finished,
+            "tick_p50_ms": percentile(durations, 0.5) * 1000,
+            "tick_p99_ms": percentile(durations, 0.99) * 1000,
+            "late_p50_ms": percentile(delays, 0.5) * 1000,
+            "late_p99_ms": percentile(delays, 0.99) * 1000,
+            "sessions_per_core": sessions_per_core,
+            "cores": os.cpu_count(),
+        }
+
+
+def parse_seed(line):
+    """Reads the seed a TCP client sends at the start of a connection.
+
+    Args:
+        line (bytes): The first line the client sent.
+
+    Raises:
+        ValueError: If the line is not a seed.
+
+    Returns:
+        int: The seed, or None for a random one.
+    """
+    line = line.strip()
+    if not line:
+        return None
+    try:
+        seed = int(line)
+    except ValueError:
+        seed = None
+    if seed is None or not 0 <= seed <= MAX_SEED:
+        raise ValueError(f"The seed must be a whole number from 0 to "
+                         f"{MAX_SEED}")
+    return seed
+
+
+async def local_client(server, seed=None, inputs_per_second=10):
+    """Plays one game on a server in the same process, through its session
+    queues, by sending random inputs.
+
+    Args:
+        server (Server): The server to play on.
+        seed (int): The seed of the game, which also seeds the inputs.
+        inputs_per_second (float): How often an input is sent.
+
+    Returns:
+        dict: The last update received, or None if the server stopped
+            before the game ended.
+    """
+    session = server.open_session(seed)
+    generator = random.Random(seed)
+    update = None
+    while server.running or not server.ticks:
+        await asyncio.sleep(generator.expovariate(inputs_per_second))
+        session.send(generator.choice(CLIENT_INPUTS))
+        while not session.updates.empty():
+            update = session.updates.get_nowait()
+        if update is not None and update["over"]:
+            return update
+    server.close_session(session)
+    return update
+
+
+async def socket_client(host=HOST, port=PORT, seed=None,
+                        inputs_per_second=10):
+    """Plays one game on a server over TCP by sending random inputs.
+
+    Args:
+        host (string): The address of the server.
+        port (int): The port of the server.
+        seed (int): The seed of the game, which also seeds the inputs.
+        inputs_per_second (float): How often an input is sent.
+
+    Returns:
+        dict: The last update received, or None if the connection was
+            closed before the game ended. If the server refused the
+            seed, its error instead.
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(b"%d\n" % seed if seed is not None else b"\n")
+    generator = random.Random(seed)
+
+    async def send_inputs():
+        while True:
+            await asyncio.sleep(generator.expovariate(inputs_per_second))
+            writer.write(bytes([generator.choice(CLIENT_INPUTS)]))
+            await writer.drain()
+
+    sending = asyncio.ensure_future(send_inputs())
+    update = None
+    try:
+        async for line in reader:
+            update = json.loads(line)
+            if "error" in update or update["over"]:
+                break
+    finally:
+        sending.cancel()
+        writer.close()
+    return update
+
+
+async def host_games(sessions, seconds, use_socket=False, port=PORT):
+    """Hosts games played by random clients, starting a new game whenever
+    one ends, and reports how the server kept up.
+
+    Args:
+        sessions (int): The number of games to keep running.
+        seconds (float): How long to run for.
+        use_socket (bool): Connect the clients over TCP instead of through
+            in-process queues.
+        port (int): The port to use with use_socket.
+
+    Returns:
+        dict: The server's metrics at the end.
+    """
+    server = Server()
+    listener = await server.listen(port=port) if use_socket else None
+    seeds = itertools.count()
+
+    async def keep_playing():
+        while server.running or not server.ticks:
+            if use_socket:
+                await socket_client(port=port, seed=next(seeds))
+            else:
+                await local_client(server, next(seeds))
+
+    ticking = asyncio.ensure_future(server.run())
+    clients = [asyncio.ensure_future(keep_playing())
+               for _ in range(sessions)]
+    await asyncio.sleep(seconds)
+    metrics = server.metrics()
+    server.stop()
+    await ticking
+    for client in clients:
+        client.cancel()
+    await asyncio.gather(*clients, return_exceptions=True)
+    if listener is not None:
+        # The connections end on their own once the clients hang up.
+        await asyncio.gather(*server.connections, return_exceptions=True)
+        listener.close()
+        await listener.wait_closed()
+    return metrics
+
+
+def main():
+    """Runs host_games from the command line and prints the metrics."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--sessions", type=int, default=500)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--socket", action="store_true",
+                        help="connect the clients over TCP")
+    parser.add_argument("--port", type=int, default=PORT)
+    args = parser.parse_args()
+    metrics = asyncio.run(host_games(args.sessions, args.seconds,
+                                     args.socket, args.port))
+    for name, value in metrics.items():
+        print(f"{name:20} {value:.2f}" if isinstance(value, float)
+              else f"{name:20} {value}")
+
+
+if __name__ == "__main__":
+    main()
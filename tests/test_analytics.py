@@ -0,0 +1,145 @@
+"""Tests for recording game events with analytics.Analytics."""
+
+import json
+import sqlite3
+import threading
+
+from analytics import Analytics, open_writer, to_record
+from bot import Bot, play_game
+from engine import Game, Spawn
+
+
+class BlockedWriter:
+    """A writer that waits in write until it is released, like a writer
+    stuck on a slow disk."""
+
+    def __init__(self):
+        self.writing = threading.Event()
+        self.release = threading.Event()
+        self.records = []
+
+    def write(self, records):
+        self.writing.set()
+        self.release.wait()
+        self.records.extend(records)
+
+    def close(self):
+        pass
+
+
+class BrokenWriter:
+    """A writer that fails every write."""
+
+    def __init__(self):
+        self.closed = False
+
+    def write(self, records):
+        raise OSError("disk full")
+
+    def close(self):
+        self.closed = True
+
+
+def record_game(analytics, seed):
+    """Plays a short bot game with its events recorded.
+
+    Returns:
+        list: The records the game's events should be written as, without
+            their times.
+    """
+    game = Game(seed=seed)
+    events = []
+    analytics.attach(game)
+    game.listeners.append(events.append)
+    play_game(Bot(workers=0), seed=seed, max_pieces=30, game=game)
+    return [to_record(0, seed, event) for event in events]
+
+
+def without_time(records):
+    """Leaves out when each event was recorded, which can't be compared."""
+    return [{key: value for key, value in record.items() if key != "time"}
+            for record in records]
+
+
+def test_ndjson_round_trip(tmp_path):
+    path = str(tmp_path / "events.ndjson")
+    analytics = Analytics(open_writer(path))
+    expected = record_game(analytics, seed=3)
+    analytics.close()
+    with open(path) as events_file:
+        records = [json.loads(line) for line in events_file]
+    assert without_time(records) == without_time(expected)
+    assert records[0]["type"] == "spawn"
+    assert {"lock", "line_clear"} <= {record["type"] for record in records}
+    assert analytics.written == len(expected)
+    assert not analytics.dropped and not analytics.failed
+
+
+def test_sqlite_round_trip(tmp_path):
+    path = str(tmp_path / "events.db")
+    analytics = Analytics(open_writer(path), batch_size=7)
+    expected = record_game(analytics, seed=4)
+    analytics.close()
+    connection = sqlite3.connect(path)
+    try:
+        rows = connection.execute(
+            "SELECT seed, type, tick, data FROM events ORDER BY rowid"
+        ).fetchall()
+    finally:
+        connection.close()
+    records = []
+    for seed, event_type, tick, data in rows:
+        record = {"seed": seed, "type": event_type, "tick": tick}
+        record.update(json.loads(data))
+        records.append(record)
+    assert without_time(records) == without_time(expected)
+    assert analytics.written == len(expected)
+
+
+def test_full_queue_drops_events():
+    writer = BlockedWriter()
+    analytics = Analytics(writer, queue_size=2, batch_size=1)
+    game = Game(seed=5)
+    analytics.record(game, Spawn(0, "T"))
+    # The writer thread has taken the first event and is stuck writing
+    # it, so the queue holds two more and the rest are dropped.
+    assert writer.writing.wait(5)
+    for tick in range(1, 6):
+        analytics.record(game, Spawn(tick, "T"))
+    assert analytics.dropped == 3
+    writer.release.set()
+    analytics.close()
+    assert [record["tick"] for record in writer.records] == [0, 1, 2]
+    assert analytics.written == 3
+
+
+def test_failed_writes_are_counted():
+    writer = BrokenWriter()
+    analytics = Analytics(writer, batch_size=2)
+    game = Game(seed=6)
+    for tick in range(5):
+        analytics.record(game, Spawn(tick, "O"))
+    analytics.close()
+    assert analytics.failed == 5
+    assert analytics.written == 0
+    assert isinstance(analytics.error, OSError)
+    assert writer.closed
+
+
+def test_close_writes_queued_events(tmp_path):
+    path = str(tmp_path / "events.ndjson")
+    # Nothing would be written for a minute without close.
+    analytics = Analytics(open_writer(path), batch_size=1000,
+                          flush_interval=60)
+    game = Game(seed=7)
+    for tick in range(5):
+        analytics.record(game, Spawn(tick, "I"))
+    analytics.close()
+    with open(path) as events_file:
+        records = [json.loads(line) for line in events_file]
+    assert [record["tick"] for record in records] == list(range(5))
+    assert all(record["seed"] == 7 for record in records)
+    assert analytics.written == 5
+    assert not analytics.thread.is_alive()
+    # Closing again does nothing.
+    analytics.close()
@@ -0,0 +1,197 @@
+"""Tests that BatchGame applies the same rules as engine.Game."""
+
+import random
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from batch import BatchGame
+from bot import Bot
+from engine import (SHAPES, ROTATIONS, Bag, Game, NOOP, LEFT, RIGHT, ROTATE,
+                    ROTATE_CC, DROP, HARD_DROP, FREEZE, UNFREEZE)
+
+
+def upcoming(game, count):
+    """Lists the indexes of the next `count` shapes a game will deal,
+    without dealing them."""
+    bag = Bag(game.shapes.seed, game.shapes.dealt)
+    shapes = [game.next.shape] + [next(bag) for _ in range(count - 1)]
+    return [SHAPES.index(shape) for shape in shapes]
+
+
+def deal_like(batch, i, game):
+    """Makes game i of a batch deal the same shapes as a Game. The batch
+    shuffles its own bags, so this is done before every step."""
+    batch.bags[i] = upcoming(game, batch.bags.shape[1])
+    batch.bag_position[i] = 0
+
+
+def copy_game(batch, i, game):
+    """Puts game i of a batch in the same state as a Game."""
+    board = game.board
+    batch.boards[i] = np.frombuffer(bytes(board.colors), dtype=np.uint8) \
+        .reshape(board.rows, board.columns)
+    tetromino = game.current
+    batch.shape[i] = tetromino.shape_index
+    batch.rotation[i] = tetromino.rotation
+    batch.left[i] = tetromino.left
+    batch.top[i] = tetromino.top
+    batch.tick_count[i] = tetromino.tick_count
+    batch.drop_rate[i] = tetromino.drop_rate
+    batch.falling[i] = tetromino.falling
+    batch.score[i] = game.score
+    batch.level[i] = game.level
+    batch.level_progress[i] = game.level_progress
+    deal_like(batch, i, game)
+
+
+def assert_same(batch, i, game):
+    """Checks that game i of a batch is in the same state as a Game."""
+    board = game.board
+    assert batch.boards[i].tobytes() == bytes(board.colors)
+    tetromino = game.current
+    assert (batch.shape[i], batch.rotation[i], batch.left[i],
+            batch.top[i]) == (tetromino.shape_index, tetromino.rotation,
+                              tetromino.left, tetromino.top)
+    assert batch.tick_count[i] == tetromino.tick_count
+    assert batch.drop_rate[i] == tetromino.drop_rate
+    assert (batch.score[i], batch.level[i], batch.level_progress[i]) == \
+        (game.score, game.level, game.level_progress)
+
+
+def run_both(games, play, steps):
+    """Steps a BatchGame and a list of Games side by side with the same
+    inputs, checking after every step that they match. A Game that ends
+    must end in the batch on the same step; it is then started over and
+    copied into the batch again.
+
+    Args:
+        games (list): The Games.
+        play (function): Called with the Games before every step to apply
+            at most one input to each of them. The same inputs are then
+            given to the batch.
+        steps (int): The number of steps to run.
+
+    Returns:
+        tuple: The number of rows cleared and games ended in total.
+    """
+    batch = BatchGame(len(games), seed=0)
+    for i, game in enumerate(games):
+        copy_game(batch, i, game)
+    rows_cleared = 0
+    ended = 0
+    for _ in range(steps):
+        for game in games:
+            game.recording = []
+        play(games)
+        actions = []
+        for i, game in enumerate(games):
+            assert len(game.recording) <= 1
+            actions.append(game.recording[0][1] if game.recording else NOOP)
+            deal_like(batch, i, game)
+        _, over = batch.step(np.array(actions))
+        for i, game in enumerate(games):
+            rows_cleared += game.tick()
+            assert bool(over[i]) == game.over
+            if game.over:
+                ended += 1
+                game.reset(game.seed + 1)
+                copy_game(batch, i, game)
+            else:
+                assert_same(batch, i, game)
+    return rows_cleared, ended
+
+
+def test_random_inputs_match_engine():
+    generator = random.Random(0)
+    choices = (NOOP, NOOP, NOOP, LEFT, RIGHT, ROTATE, ROTATE_CC, DROP)
+
+    def play(games):
+        for game in games:
+            game.apply(generator.choice(choices))
+
+    games = [Game(seed=seed) for seed in range(8)]
+    _, ended = run_both(games, play, 1500)
+    assert ended
+
+
+def test_hard_drops_and_freezes_match_engine():
+    generator = random.Random(2)
+    choices = (NOOP, NOOP, NOOP, LEFT, RIGHT, ROTATE, ROTATE_CC, HARD_DROP,
+               FREEZE, UNFREEZE)
+
+    def play(games):
+        for game in games:
+            game.apply(generator.choice(choices))
+
+    games = [Game(seed=seed) for seed in range(8)]
+    _, ended = run_both(games, play, 1500)
+    assert ended
+
+
+def test_bot_hard_drops_match_engine(monkeypatch):
+    # The bot finishes every move with a hard drop instead of a soft one,
+    # so pieces land on a stack with holes and clear rows.
+    monkeypatch.setattr("bot.DROP", HARD_DROP)
+    bots = [Bot(workers=0) for _ in range(2)]
+
+    def play(games):
+        for bot, game in zip(bots, games):
+            bot.step(game)
+
+    games = [Game(seed=seed) for seed in range(2, 4)]
+    rows_cleared, _ = run_both(games, play, 1000)
+    assert rows_cleared
+
+
+def test_bot_games_match_engine():
+    bots = [Bot(workers=0) for _ in range(2)]
+
+    def play(games):
+        for bot, game in zip(bots, games):
+            bot.step(game)
+
+    games = [Game(seed=seed) for seed in range(2)]
+    rows_cleared, _ = run_both(games, play, 2500)
+    # Long enough for line clears and a level up.
+    assert rows_cleared
+    assert all(game.level > 1 for game in games)
+
+
+def test_place_matches_hard_drop():
+    generator = random.Random(1)
+    games = [Game(seed=seed) for seed in range(8)]
+    batch = BatchGame(len(games), seed=0)
+    for i, game in enumerate(games):
+        copy_game(batch, i, game)
+    placed = 0
+    for _ in range(300):
+        rotations = []
+        lefts = []
+        for i, game in enumerate(games):
+            tetromino = game.current
+            rotation = generator.randrange(4)
+            state = ROTATIONS[tetromino.shape_index][rotation]
+            left = generator.randrange(-state.left,
+                                       game.columns - state.right)
+            rotations.append(rotation)
+            lefts.append(left)
+            tetromino.rotation = rotation
+            tetromino.left = left
+            game.apply(HARD_DROP)
+            deal_like(batch, i, game)
+        _, over = batch.place(np.array(rotations), np.array(lefts))
+        for i, game in enumerate(games):
+            game.tick()
+            assert bool(over[i]) == game.over
+            if game.over:
+                game.reset(game.seed + 1)
+                copy_game(batch, i, game)
+                continue
+            placed += 1
+            assert batch.boards[i].tobytes() == bytes(game.board.colors)
+            assert batch.shape[i] == game.current.shape_index
+            assert (batch.score[i], batch.level[i]) == \
+                (game.score, game.level)
+    assert placed
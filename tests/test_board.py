@@ -0,0 +1,116 @@
+"""Tests for the row masks, heights and counts that Board keeps up to date
+as blocks are placed and rows are removed."""
+
+import random
+
+import pytest
+
+from engine import SHAPES, Board, Tetromino
+
+
+def grid(board):
+    """Reads a board's cells from its colors, as a list of rows of color
+    indexes, with 0 for an empty cell."""
+    columns = board.columns
+    return [list(board.colors[row * columns:(row + 1) * columns])
+            for row in range(board.rows)]
+
+
+def assert_consistent(board):
+    """Checks a board's masks, heights and counts against a recount of
+    its cells."""
+    cells = grid(board)
+    assert board.masks == [sum(1 << column for column, color in
+                               enumerate(row) if color) for row in cells]
+    assert board.counts == [sum(1 for color in row if color)
+                            for row in cells]
+    assert board.heights == [
+        next((row for row in range(board.rows) if cells[row][column]),
+             board.rows) for column in range(board.columns)]
+
+
+def stacked_board(generator, filled_rows, columns=10, rows=20):
+    """Builds a board whose bottom rows each have a few random blocks, and
+    at least one, so no empty row lies under a filled one."""
+    board = Board(columns, rows)
+    for row in range(rows - filled_rows, rows):
+        chosen = generator.sample(range(columns),
+                                  generator.randrange(1, columns + 1))
+        board.place([(column, row) for column in chosen],
+                    generator.randrange(len(SHAPES)))
+    return board
+
+
+def removed(cells, rows):
+    """Removes rows from a grid the slow way, moving everything above them
+    down and adding empty rows at the top."""
+    kept = [row for index, row in enumerate(cells) if index not in rows]
+    return [[0] * len(cells[0]) for _ in rows] + kept
+
+
+def test_random_locks_and_clears_keep_counts():
+    # A narrow board, so random drops fill rows often enough to clear.
+    generator = random.Random(0)
+    board = Board(4, 16)
+    cleared = 0
+    for _ in range(2000):
+        tetromino = Tetromino(generator.choice(SHAPES), board.columns)
+        tetromino.rotation = generator.randrange(4)
+        state = tetromino.state
+        tetromino.left = generator.randrange(-state.left,
+                                             board.columns - state.right)
+        tetromino.top = -4
+        tetromino.hard_drop(board)
+        board.place(tetromino.cells(), tetromino.shape_index)
+        if board.topped_out:
+            board = Board(4, 16)
+            continue
+        cleared += board.clear_lines(
+            {row for _, row in tetromino.cells()})
+        assert_consistent(board)
+    assert cleared > 100
+
+
+@pytest.mark.parametrize("rows", [
+    [19],
+    [10, 14, 19],
+    [12, 13, 17],
+    [8],
+    [8, 9],
+    [8, 11, 16],
+])
+def test_remove_rows_matches_a_recount(rows):
+    # The stack fills rows 8 to 19, so 8 is the top of the stack.
+    board = stacked_board(random.Random(sum(rows)), filled_rows=12)
+    expected = removed(grid(board), rows)
+    board.remove_rows(rows)
+    assert grid(board) == expected
+    assert_consistent(board)
+
+
+def test_remove_rows_of_a_full_board():
+    board = stacked_board(random.Random(1), filled_rows=20)
+    rows = [0, 5, 6, 19]
+    expected = removed(grid(board), rows)
+    board.remove_rows(rows)
+    assert grid(board) == expected
+    assert_consistent(board)
+    assert board.masks[:4] == [0] * 4
+
+
+def test_remove_nothing():
+    board = stacked_board(random.Random(2), filled_rows=5)
+    before = grid(board)
+    board.remove_rows([])
+    assert grid(board) == before
+    assert_consistent(board)
+
+
+def test_place_over_a_block_counts_it_once():
+    board = Board(4, 4)
+    board.place([(1, 3), (2, 3)], 0)
+    board.place([(2, 3), (2, 2)], 1)
+    assert board.counts == [0, 0, 1, 2]
+    assert board.heights == [4, 3, 2, 4]
+    assert board.color(2, 3) == board.color(2, 2)
+    assert_consistent(board)
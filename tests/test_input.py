@@ -0,0 +1,153 @@
+"""Tests for AutoShift and LatencyMeter, which handle held and pressed
+keys."""
+
+import pytest
+
+from engine import AutoShift, LEFT, RIGHT, NOOP
+from profiler import LatencyMeter
+
+
+class FakeClock:
+    """A clock that only moves when told to."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def shifts(autoshift, ticks, columns=10):
+    """Updates an AutoShift for a number of ticks and returns the number
+    of shifts it asked for on each of them."""
+    return [autoshift.update(columns) for _ in range(ticks)]
+
+
+def test_nothing_held_never_shifts():
+    autoshift = AutoShift(delay=3, repeat=1)
+    assert autoshift.direction == NOOP
+    assert shifts(autoshift, 5) == [0] * 5
+
+
+def test_delay_then_repeat():
+    autoshift = AutoShift(delay=3, repeat=2)
+    autoshift.press(LEFT)
+    assert autoshift.direction == LEFT
+    assert shifts(autoshift, 8) == [0, 0, 1, 0, 1, 0, 1, 0]
+
+
+def test_zero_repeat_shifts_to_the_wall():
+    autoshift = AutoShift(delay=2, repeat=0)
+    autoshift.press(RIGHT)
+    assert shifts(autoshift, 3, columns=12) == [0, 12, 12]
+
+
+def test_last_pressed_direction_wins():
+    autoshift = AutoShift(delay=2, repeat=1)
+    autoshift.press(LEFT)
+    shifts(autoshift, 5)
+    autoshift.press(RIGHT)
+    assert autoshift.direction == RIGHT
+    # Pressing a direction starts charging from the beginning.
+    assert shifts(autoshift, 3) == [0, 1, 1]
+
+
+def test_release_falls_back_to_other_direction():
+    autoshift = AutoShift(delay=2, repeat=1)
+    autoshift.press(LEFT)
+    autoshift.press(RIGHT)
+    shifts(autoshift, 5)
+    autoshift.release(RIGHT)
+    assert autoshift.direction == LEFT
+    assert shifts(autoshift, 2) == [0, 1]
+    autoshift.release(LEFT)
+    assert autoshift.direction == NOOP
+    assert shifts(autoshift, 2) == [0, 0]
+
+
+def test_releasing_a_key_not_held_changes_nothing():
+    autoshift = AutoShift(delay=2, repeat=1)
+    autoshift.press(LEFT)
+    shifts(autoshift, 1)
+    autoshift.release(RIGHT)
+    assert shifts(autoshift, 1) == [1]
+
+
+def test_reset_forgets_held_keys():
+    autoshift = AutoShift(delay=2, repeat=1)
+    autoshift.press(LEFT)
+    autoshift.press(RIGHT)
+    autoshift.reset()
+    assert autoshift.direction == NOOP
+    assert shifts(autoshift, 3) == [0, 0, 0]
+
+
+def test_latency_from_press_to_display():
+    clock = FakeClock()
+    latency = LatencyMeter(clock=clock)
+    clock.now = 1.0
+    latency.press()
+    clock.now = 1.005
+    latency.displayed()
+    assert list(latency.latencies) == [pytest.approx(0.005)]
+
+
+def test_only_first_press_before_a_frame_is_measured():
+    clock = FakeClock()
+    latency = LatencyMeter(clock=clock)
+    latency.press()
+    clock.now = 0.004
+    latency.press()
+    clock.now = 0.010
+    latency.displayed()
+    assert list(latency.latencies) == [pytest.approx(0.010)]
+
+
+def test_frames_without_a_press_are_not_measured():
+    clock = FakeClock()
+    latency = LatencyMeter(clock=clock)
+    latency.displayed()
+    clock.now = 1.0
+    latency.displayed()
+    assert not latency.latencies
+
+
+def test_skipped_frame_drops_the_press():
+    clock = FakeClock()
+    latency = LatencyMeter(clock=clock)
+    latency.press()
+    clock.now = 0.002
+    latency.skipped()
+    # A later frame that changes the screen for another reason doesn't
+    # count towards the dropped press.
+    clock.now = 0.500
+    latency.displayed()
+    assert not latency.latencies
+    latency.press()
+    clock.now = 0.503
+    latency.displayed()
+    assert list(latency.latencies) == [pytest.approx(0.003)]
+
+
+def test_keeps_the_last_samples():
+    clock = FakeClock()
+    latency = LatencyMeter(samples=3, clock=clock)
+    for milliseconds in range(1, 6):
+        latency.press()
+        clock.now += milliseconds / 1000
+        latency.displayed()
+    assert list(latency.latencies) == pytest.approx([0.003, 0.004, 0.005])
+    p50, p99 = latency.summary()
+    assert p50 == pytest.approx(4.0)
+    assert p99 == pytest.approx(5.0)
+
+
+def test_write_csv(tmp_path):
+    clock = FakeClock()
+    latency = LatencyMeter(clock=clock)
+    latency.press()
+    clock.now = 0.0125
+    latency.displayed()
+    path = tmp_path / "input.csv"
+    latency.write_csv(str(path))
+    assert path.read_text().splitlines() == ["input_latency", "12.500"]
@@ -0,0 +1,86 @@
+"""Tests for recording games and playing them back from replays."""
+
+import random
+
+import pytest
+
+from bot import Bot, play_game
+from engine import Game, LEFT, RIGHT, ROTATE, ROTATE_CC, DROP, HARD_DROP
+from replay import Replay, play, read_varint, record, write_varint
+
+
+def record_game(seed, columns=12, rows=22, ticks=3000):
+    """Records a game played with random inputs until it ends, or for at
+    most `ticks` ticks.
+    """
+    generator = random.Random(seed)
+    game = Game(columns, rows)
+    record(game, seed)
+    while not game.over and game.ticks < ticks:
+        if generator.random() < 0.3:
+            game.apply(generator.choice(
+                (LEFT, RIGHT, ROTATE, ROTATE_CC, DROP, HARD_DROP)))
+        game.tick()
+    return game
+
+
+@pytest.mark.parametrize("value", [0, 1, 127, 128, 300, 2 ** 35])
+def test_varint_round_trip(value):
+    buffer = bytearray()
+    write_varint(buffer, value)
+    assert read_varint(bytes(buffer), 0) == (value, len(buffer))
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2 ** 64 - 1])
+def test_replay_plays_back_the_same_game(seed):
+    game = record_game(seed)
+    replay = Replay.from_bytes(Replay.from_game(game).to_bytes())
+    assert replay.seed == game.seed
+    assert replay.inputs == game.recording
+    assert play(replay).snapshot() == game.snapshot()
+
+
+def test_replay_of_a_game_with_line_clears():
+    game = Game()
+    record(game)
+    play_game(Bot(workers=0), seed=11, max_pieces=40, game=game)
+    assert game.score > 0
+    replay = Replay.from_bytes(Replay.from_game(game).to_bytes())
+    assert play(replay).snapshot() == game.snapshot()
+
+
+def test_replay_of_a_game_in_progress():
+    game = record_game(3, ticks=100)
+    assert not game.over
+    replay = Replay.from_bytes(Replay.from_game(game).to_bytes())
+    assert play(replay).snapshot() == game.snapshot()
+
+
+def test_replay_keeps_the_board_size():
+    game = record_game(4, columns=8, rows=16)
+    replay = Replay.from_bytes(Replay.from_game(game).to_bytes())
+    assert (replay.columns, replay.rows) == (8, 16)
+    assert play(replay).snapshot() == game.snapshot()
+
+
+def test_play_reuses_a_game():
+    first = record_game(5)
+    second = record_game(6)
+    game = Game()
+    for recorded in (first, second):
+        replay = Replay.from_game(recorded)
+        assert play(replay, game).snapshot() == recorded.snapshot()
+
+
+def test_save_and_load(tmp_path):
+    game = record_game(7)
+    path = tmp_path / "game.replay"
+    Replay.from_game(game).save(path)
+    assert play(Replay.load(path)).snapshot() == game.snapshot()
+
+
+def test_rejects_other_data():
+    data = bytearray(Replay(1).to_bytes())
+    data[:4] = b"NOPE"
+    with pytest.raises(ValueError):
+        Replay.from_bytes(bytes(data))
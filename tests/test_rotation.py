@@ -0,0 +1,143 @@
+"""Tests for the rotation tables and Super Rotation System wall kicks."""
+
+import pytest
+
+from engine import (SHAPES, ROTATIONS, KICKS, JLSTZ_KICKS, I_KICKS,
+                    SPAWN_STATES, Board, Tetromino)
+
+
+# The SRS kick tables as they are usually published, with y pointing up.
+SRS_JLSTZ = {
+    (0, 1): ((0, 0), (-1, 0), (-1, 1), (0, -2), (-1, -2)),
+    (1, 0): ((0, 0), (1, 0), (1, -1), (0, 2), (1, 2)),
+    (1, 2): ((0, 0), (1, 0), (1, -1), (0, 2), (1, 2)),
+    (2, 1): ((0, 0), (-1, 0), (-1, 1), (0, -2), (-1, -2)),
+    (2, 3): ((0, 0), (1, 0), (1, 1), (0, -2), (1, -2)),
+    (3, 2): ((0, 0), (-1, 0), (-1, -1), (0, 2), (-1, 2)),
+    (3, 0): ((0, 0), (-1, 0), (-1, -1), (0, 2), (-1, 2)),
+    (0, 3): ((0, 0), (1, 0), (1, 1), (0, -2), (1, -2)),
+}
+SRS_I = {
+    (0, 1): ((0, 0), (-2, 0), (1, 0), (-2, -1), (1, 2)),
+    (1, 0): ((0, 0), (2, 0), (-1, 0), (2, 1), (-1, -2)),
+    (1, 2): ((0, 0), (-1, 0), (2, 0), (-1, 2), (2, -1)),
+    (2, 1): ((0, 0), (1, 0), (-2, 0), (1, -2), (-2, 1)),
+    (2, 3): ((0, 0), (2, 0), (-1, 0), (2, 1), (-1, -2)),
+    (3, 2): ((0, 0), (-2, 0), (1, 0), (-2, -1), (1, 2)),
+    (3, 0): ((0, 0), (1, 0), (-2, 0), (1, -2), (-2, 1)),
+    (0, 3): ((0, 0), (-1, 0), (2, 0), (-1, 2), (2, -1)),
+}
+
+
+def flip(table):
+    """Turns a kick table with y pointing up into one with rows counted
+    downwards, as engine.py uses."""
+    return {turn: tuple((x, -y) for x, y in kicks)
+            for turn, kicks in table.items()}
+
+
+def test_kick_tables_match_srs():
+    assert JLSTZ_KICKS == flip(SRS_JLSTZ)
+    assert I_KICKS == flip(SRS_I)
+
+
+@pytest.mark.parametrize("table", [JLSTZ_KICKS, I_KICKS])
+def test_turning_back_undoes_the_kick(table):
+    for (start, end), kicks in table.items():
+        assert table[end, start] == tuple((-x, -y) for x, y in kicks)
+
+
+@pytest.mark.parametrize("shape", SHAPES)
+def test_kicks_follow_the_spawn_state(shape):
+    table = I_KICKS if shape == "I" else JLSTZ_KICKS
+    spawn = SPAWN_STATES.get(shape, 0)
+    kicks = KICKS[SHAPES.index(shape)]
+    for rotation in range(4):
+        for direction in (1, -1):
+            if shape == "O":
+                assert kicks[rotation][direction] == ((0, 0),)
+            else:
+                turn = ((rotation + spawn) % 4,
+                        (rotation + direction + spawn) % 4)
+                assert kicks[rotation][direction] == table[turn]
+
+
+@pytest.mark.parametrize("shape", SHAPES)
+def test_four_turns_return_to_the_start(shape):
+    rotations = ROTATIONS[SHAPES.index(shape)]
+    for state in rotations:
+        assert len(state.cells) == 4
+    tetromino = Tetromino(shape)
+    cells = tetromino.cells()
+    for direction in (1, -1):
+        for _ in range(4):
+            tetromino.turn(direction)
+        assert tetromino.cells() == cells
+
+
+def test_rotation_states():
+    assert set(ROTATIONS[SHAPES.index("T")][1].cells) == \
+        {(1, 0), (1, 1), (2, 1), (1, 2)}
+    assert set(ROTATIONS[SHAPES.index("I")][1].cells) == \
+        {(2, 0), (2, 1), (2, 2), (2, 3)}
+
+
+def free_tetromino(shape, board):
+    """Puts a Tetromino in the middle of an empty area of the board."""
+    tetromino = Tetromino(shape, board.columns)
+    tetromino.top = board.rows // 2
+    return tetromino
+
+
+@pytest.mark.parametrize("shape", SHAPES)
+def test_rotation_in_the_open_does_not_kick(shape):
+    board = Board()
+    tetromino = free_tetromino(shape, board)
+    left, top = tetromino.left, tetromino.top
+    assert tetromino.rotate(board)
+    assert (tetromino.left, tetromino.top) == (left, top)
+    assert tetromino.rotate_cc(board)
+    assert (tetromino.rotation, tetromino.left, tetromino.top) == \
+        (0, left, top)
+
+
+def test_blocked_rotation_uses_the_next_kick():
+    board = Board()
+    tetromino = free_tetromino("T", board)
+    # Block a cell the rotated T would cover in place, but not once it has
+    # moved one column to the left, the second kick of the 0 -> 1 turn.
+    rotated = {(tetromino.left + x, tetromino.top + y)
+               for x, y in ROTATIONS[SHAPES.index("T")][1].cells}
+    moved = {(column - 1, row) for column, row in rotated}
+    column, row = sorted(rotated - moved - set(tetromino.cells()))[0]
+    board.place([(column, row)], 0)
+    left, top = tetromino.left, tetromino.top
+    assert tetromino.rotate(board)
+    assert (tetromino.rotation, tetromino.left, tetromino.top) == \
+        (1, left - 1, top)
+
+
+def test_i_kicks_off_the_wall():
+    board = Board()
+    tetromino = free_tetromino("I", board)
+    tetromino.rotate(board)
+    # Vertical, against the left wall.
+    tetromino.left = -2
+    assert tetromino.fits(board, tetromino.left, tetromino.top, 1)
+    assert tetromino.rotate(board)
+    assert all(0 <= column < board.columns
+               for column, _ in tetromino.cells())
+
+
+def test_rotation_with_no_room_does_nothing():
+    board = Board()
+    tetromino = free_tetromino("T", board)
+    cells = set(tetromino.cells())
+    board.place([(column, row)
+                 for column in range(board.columns)
+                 for row in range(board.rows)
+                 if (column, row) not in cells], 0)
+    before = (tetromino.rotation, tetromino.left, tetromino.top)
+    assert not tetromino.rotate(board)
+    assert not tetromino.rotate_cc(board)
+    assert (tetromino.rotation, tetromino.left, tetromino.top) == before
@@ -0,0 +1,109 @@
+"""Tests for hosting games with server.Server."""
+
+import asyncio
+import json
+
+import pytest
+
+from engine import FREEZE, LEFT
+from server import Server, host_games, local_client, socket_client
+
+
+# Ticks the server fast enough for games to end within a second.
+TICK_RATE = 1000
+
+
+async def play_games(server, clients):
+    """Ticks a server until every client coroutine has returned.
+
+    Returns:
+        list: What every client returned.
+    """
+    ticking = asyncio.ensure_future(server.run())
+    try:
+        return await asyncio.gather(*clients)
+    finally:
+        server.stop()
+        await ticking
+
+
+def test_local_clients_play_to_the_end():
+    server = Server(tick_rate=TICK_RATE)
+    updates = asyncio.run(play_games(server, [
+        local_client(server, seed, inputs_per_second=200)
+        for seed in range(20)]))
+    assert all(update["over"] for update in updates)
+    assert server.finished == 20
+    assert not server.sessions
+
+
+def test_host_games_reports_metrics():
+    metrics = asyncio.run(host_games(10, 0.5))
+    assert metrics["sessions"] == 10
+    assert metrics["ticks"] > 0
+    assert metrics["sessions_per_core"] > 0
+
+
+def test_session_ignores_other_inputs():
+    session = Server().open_session(seed=1)
+    assert not session.send(FREEZE)
+    assert not session.send(255)
+    assert session.send(LEFT)
+    assert list(session.inputs) == [LEFT]
+    # With FREEZE ignored, gravity still ends the game.
+    for _ in range(5000):
+        if session.step():
+            break
+    assert session.game.over
+
+
+async def connect(server, line):
+    """Opens a TCP connection to a listening server and sends a seed line.
+
+    Returns:
+        tuple: The reader and writer of the connection.
+    """
+    listener = await server.listen(port=0)
+    port = listener.sockets[0].getsockname()[1]
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(line)
+    return listener, reader, writer
+
+
+def test_socket_client_plays_to_the_end():
+    async def main():
+        server = Server(tick_rate=TICK_RATE)
+        listener = await server.listen(port=0)
+        port = listener.sockets[0].getsockname()[1]
+        updates = await play_games(server, [
+            socket_client(port=port, seed=seed, inputs_per_second=200)
+            for seed in range(5)])
+        await asyncio.gather(*server.connections)
+        listener.close()
+        await listener.wait_closed()
+        return server, updates
+
+    server, updates = asyncio.run(main())
+    assert all(update["over"] for update in updates)
+    assert not server.sessions
+    assert not server.connections
+
+
+@pytest.mark.parametrize("line", [b"abc\n", b"-1\n", b"%d\n" % 2 ** 64])
+def test_bad_seed_gets_an_error(line):
+    async def main():
+        server = Server()
+        listener, reader, writer = await connect(server, line)
+        reply = await reader.readline()
+        rest = await reader.read()
+        writer.close()
+        await asyncio.gather(*server.connections)
+        listener.close()
+        await listener.wait_closed()
+        return server, reply, rest
+
+    server, reply, rest = asyncio.run(main())
+    assert "error" in json.loads(reply)
+    assert rest == b""
+    assert not server.sessions
+    assert not server.connections
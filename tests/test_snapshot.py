@@ -0,0 +1,56 @@
+"""Tests for Game.snapshot and Game.restore."""
+
+import pytest
+
+from engine import Game, LEFT, ROTATE, HARD_DROP
+
+
+def play(game, ticks):
+    """Plays a few moves with every Tetromino, so the board fills up."""
+    for tick in range(ticks):
+        if tick % 7 == 0:
+            game.apply((LEFT, ROTATE, HARD_DROP)[tick % 3])
+        game.tick()
+        if game.over:
+            break
+
+
+def test_restore_rolls_back():
+    game = Game(seed=1)
+    play(game, 300)
+    state = game.snapshot()
+    play(game, 300)
+    assert game.snapshot() != state
+    game.restore(state)
+    assert game.snapshot() == state
+
+
+def test_restored_game_plays_the_same():
+    game = Game(seed=2)
+    play(game, 200)
+    state = game.snapshot()
+    play(game, 400)
+    other = Game(seed=3)
+    other.restore(state)
+    play(other, 400)
+    assert other.snapshot() == game.snapshot()
+
+
+def test_restore_can_be_repeated():
+    game = Game(seed=4)
+    play(game, 100)
+    state = game.snapshot()
+    for _ in range(3):
+        game.restore(state)
+        play(game, 50)
+    game.restore(state)
+    assert game.snapshot() == state
+
+
+def test_restore_rejects_other_board_size():
+    state = Game(12, 22, seed=5).snapshot()
+    game = Game(10, 20, seed=5)
+    with pytest.raises(ValueError):
+        game.restore(state)
+    assert len(game.board.masks) == 20
+    assert len(game.board.colors) == 200
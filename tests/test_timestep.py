@@ -0,0 +1,98 @@
+"""Tests for FixedTimestep, which turns real time into game ticks."""
+
+import pytest
+
+from engine import FixedTimestep
+
+
+class FakeClock:
+    """A clock that only moves when told to."""
+
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_timestep(tick_rate=4, max_ticks=10):
+    """Builds a FixedTimestep on a fake clock. The default tick of a
+    quarter second is exact in binary, so sums of ticks compare equal."""
+    clock = FakeClock()
+    return FixedTimestep(tick_rate, max_ticks, clock=clock), clock
+
+
+def test_whole_ticks_are_taken_out_of_the_accumulator():
+    timestep, clock = make_timestep()
+    assert timestep.advance() == 0
+    clock.now += 0.125
+    assert timestep.advance() == 0
+    assert timestep.accumulator == 0.125
+    clock.now += 0.125
+    assert timestep.advance() == 1
+    assert timestep.accumulator == 0.0
+    clock.now += 0.875
+    assert timestep.advance() == 3
+    assert timestep.accumulator == 0.125
+
+
+def test_ticks_keep_pace_with_any_frame_rate():
+    for frame_time in (1 / 7, 1 / 60, 1 / 144, 0.4):
+        timestep, clock = make_timestep()
+        ticks = 0
+        for _ in range(int(10 / frame_time)):
+            clock.now += frame_time
+            ticks += timestep.advance()
+        # Ten seconds is forty ticks, give or take the time left over.
+        assert 39 <= ticks <= 40
+
+
+def test_clamps_ticks_owed_at_once():
+    timestep, clock = make_timestep(max_ticks=3)
+    clock.now += 60.0
+    assert timestep.advance() == 3
+    # The rest of the time owed is dropped rather than caught up.
+    assert timestep.accumulator == 0.0
+    assert timestep.advance() == 0
+    clock.now += 0.25
+    assert timestep.advance() == 1
+
+
+def test_up_to_max_ticks_are_all_run():
+    timestep, clock = make_timestep(max_ticks=3)
+    clock.now += 0.875
+    assert timestep.advance() == 3
+    assert timestep.accumulator == 0.125
+
+
+def test_reset_discards_time_owed():
+    timestep, clock = make_timestep()
+    clock.now += 0.125
+    timestep.advance()
+    clock.now += 30.0
+    timestep.reset()
+    assert timestep.accumulator == 0.0
+    assert timestep.advance() == 0
+    clock.now += 0.25
+    assert timestep.advance() == 1
+
+
+def test_time_to_next_tick():
+    timestep, clock = make_timestep()
+    assert timestep.time_to_next_tick == 0.25
+    clock.now += 0.125
+    timestep.advance()
+    assert timestep.time_to_next_tick == 0.125
+    # Time since the last advance counts too.
+    clock.now += 0.0625
+    assert timestep.time_to_next_tick == 0.0625
+    # A tick that is overdue is due now, not in negative time.
+    clock.now += 1.0
+    assert timestep.time_to_next_tick == 0.0
+
+
+def test_alpha():
+    timestep, clock = make_timestep()
+    clock.now += 0.3125
+    assert timestep.advance() == 1
+    assert timestep.alpha == pytest.approx(0.25)
@@ -1,12 +1,23 @@
 #! python3
 
-import random
+import atexit
+import functools
+import os
+import sys
+import time
+
+# Taken before pygame is imported, so the time to the first frame includes
+# loading it.
+STARTED_AT = time.perf_counter()
+
 import pygame
 from pygame.locals import *
 
+from engine import (COLUMNS, ROWS, SHAPES, COLORS, Tetromino, Game,
+                    FixedTimestep, AutoShift, LineClear, LEFT, RIGHT)
+from replay import Replay, record
+from profiler import Profiler, LatencyMeter
 
-pygame.init()
-pygame.font.init()
 
 # GLOBAL CONSTANTS
 
@@ -18,248 +29,139 @@ SCORE_HEIGHT = 100
 SCORE_WIDTH = 250
 NEXT_PIECE_SIZE = 180
 GRID_SIZE = 40
-STAT_FONT = pygame.font.SysFont("comicsans", 40)
+GRID_LINE_MIN_SIZE = 6
+BOARD_COLUMNS = COLUMNS
+BOARD_ROWS = ROWS
+FONT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         "NovaSquare-Regular.ttf")
+STAT_FONT_SIZE = 28
+PROFILE_FONT_SIZE = 16
 TEXT_COLOR = (0, 0, 0)
 BACKGROUND_COLOR = (50, 60, 180)
 PAUSE_COLOR = (20, 20, 20, 100)
 BANNER_COLOR = (110, 110, 110)
 GRID_COLOR = (200, 200, 200)
+GRID_KEY_COLOR = (255, 0, 255)
+FLASH_COLOR = (255, 255, 255)
+FLASH_ALPHA = 200
+LINE_CLEAR_FRAMES = 8
+PLAY_AREA_POSITION = (15, 15)
+NEXT_PIECE_POSITION = (PLAY_AREA_WIDTH + 70, 50)
+SCORE_POSITION = (PLAY_AREA_WIDTH + 40, 105 + NEXT_PIECE_SIZE)
+DIRTY_RECTS = True
+FRAME_RATE = 144
+IDLE_TIMEOUT = 1000
+REPLAY_DIRECTORY = None
+ANALYTICS_PATH = None
+AUTOPLAY = False
+HANDLED_EVENTS = [QUIT, KEYDOWN, KEYUP, WINDOWEXPOSED, WINDOWFOCUSLOST,
+                  WINDOWFOCUSGAINED, WINDOWMINIMIZED, WINDOWRESTORED]
+TEXT_CACHE_SIZE = 64
+LEFT_KEYS = [K_LEFT, K_KP4]
+RIGHT_KEYS = [K_RIGHT, K_KP6]
+ROTATE_KEYS = [K_UP, K_x, K_KP1, K_KP5, K_KP9]
+ROTATE_CC_KEYS = [K_z, K_LCTRL, K_RCTRL, K_KP3, K_KP7]
+DROP_KEYS = [K_DOWN, K_KP2]
+HARD_DROP_KEYS = [K_SPACE, K_KP8]
+FREEZE_KEYS = [K_LSHIFT, K_RSHIFT, K_c, K_KP0]
+PAUSE_KEYS = [K_ESCAPE, K_F1]
+# The keys whose presses are timed as input lag. Freezing is left out,
+# since it is held rather than pressed and shows nothing until released.
+GAMEPLAY_KEYS = (LEFT_KEYS + RIGHT_KEYS + ROTATE_KEYS + ROTATE_CC_KEYS +
+                 DROP_KEYS + HARD_DROP_KEYS)
+PROFILE_POSITION = (PLAY_AREA_WIDTH + 35, 420)
+PROFILE_SIZE = (SCORE_WIDTH + 10, 220)
+PROFILE_COLOR = (20, 20, 20)
+PROFILE_TEXT_COLOR = (230, 230, 230)
+PROFILE_REFRESH_FRAMES = 30
+PROFILE_DIRECTORY = "profiles"
+
+# Loaded by startup, once pygame's font module is initialized.
+STAT_FONT = None
+PROFILE_FONT = None
+
+
+@functools.lru_cache(maxsize=TEXT_CACHE_SIZE)
+def render_text(text, color, font):
+    """Renders a string with antialiasing, reusing the surface from an
+    earlier call with the same text, color and font. The least recently
+    used surfaces are dropped once TEXT_CACHE_SIZE strings are cached.
 
-SHAPES = ("I", "O", "T", "S", "Z", "J", "L")
-COLORS = [
-    (0, 255, 255),
-    (255, 255, 0),
-    (128, 0, 128),
-    (0, 128, 0),
-    (255, 0, 0),
-    (0, 0, 255),
-    (255, 165, 0)
-]
-
-
-class Tetromino:
-    """Class used to create Tetromino objects
+    Args:
+        text (string): The text to render.
+        color (tuple): The RGB color of the text.
+        font (pygame font): The font to render the text with.
 
     Returns:
-        [Tetromino object]:
-        [has a shape, a bounding box,
-        and functions associated with
-        drawing and moving the object.]
+        pygame surface: The rendered text. It is shared between callers, so
+            it must not be drawn on.
     """
+    return font.render(text, 1, color)
 
-    DROP_RATE = 5
-
-    def __init__(self, shape):
-        self.shape = shape
-        self.set_blocks()
-        self.falling = True
-        self.tick_count = 0
-        if self.shape == "I" or self.shape == "O":
-            self.bounding_box = pygame.Rect(
-                int(PLAY_AREA_WIDTH / 2) - GRID_SIZE * 2,
-                -120,
-                (GRID_SIZE * len(self.blocks)),
-                (GRID_SIZE * len(self.blocks))
-            )
-        else:
-            self.bounding_box = pygame.Rect(
-                int(PLAY_AREA_WIDTH / 2) - GRID_SIZE,
-                -200,
-                (GRID_SIZE * len(self.blocks)),
-                (GRID_SIZE * len(self.blocks))
-            )
-        self.squares = []
-        for x in range(len(self.blocks)):
-            for y in range(len(self.blocks)):
-                if self.blocks[y][x]:
-                    self.squares.append(pygame.Rect(
-                        (self.bounding_box.left + GRID_SIZE * x),
-                        (self.bounding_box.top + GRID_SIZE * y),
-                        GRID_SIZE,
-                        GRID_SIZE
-                    ))
-        for i, SHAPE in enumerate(SHAPES):
-            if self.shape == SHAPE:
-                self.color = COLORS[i]
-
-    def deepcopy(self):
-        """Creates a deepcopy of the object it is called on.
 
-        Returns:
-            Tetromino object: Used to display the next piece in the window to
-            the side of the play area. A deepcopy is needed to ensure that the
-            position of the next piece isn't changed while drawing it in the
-            next piece window.
-        """
-        return Tetromino(self.shape)
+def draw_tetromino(surface, tetromino, left, top):
+    """Draws a Tetromino onto the surface given.
 
-    def set_blocks(self):
-        """Uses the string version of the Tetromino's shape to generate an
-        array that can be used to draw and rotate the Tetromino.
-        """
-        if self.shape == "I":
-            self.blocks = [
-                [0, 0, 0, 0],
-                [1, 1, 1, 1],
-                [0, 0, 0, 0],
-                [0, 0, 0, 0]
-            ]
-        elif self.shape == "O":
-            self.blocks = [
-                [0, 0, 0, 0],
-                [0, 1, 1, 0],
-                [0, 1, 1, 0],
-                [0, 0, 0, 0]
-            ]
-        elif self.shape == "T":
-            self.blocks = [
-                [0, 1, 0],
-                [1, 1, 1],
-                [0, 0, 0]
-            ]
-        elif self.shape == "S":
-            self.blocks = [
-                [0, 1, 1],
-                [1, 1, 0],
-                [0, 0, 0]
-            ]
-        elif self.shape == "Z":
-            self.blocks = [
-                [1, 1, 0],
-                [0, 1, 1],
-                [0, 0, 0]
-            ]
-        elif self.shape == "J":
-            self.blocks = [
-                [1, 0, 0],
-                [1, 1, 1],
-                [0, 0, 0]
-            ]
-        elif self.shape == "L":
-            self.blocks = [
-                [0, 0, 0],
-                [1, 1, 1],
-                [1, 0, 0]
-            ]
-
-    def rotate(self):
-        """Rotates the Tetromino clockwise
-        """
-        rotated = [[] for _ in range(len(self.blocks))]
-        for x in range(len(self.blocks)):
-            for y in range(len(self.blocks)):
-                rotated[x].append(self.blocks[abs(y-(len(self.blocks)-1))][x])
-        self.blocks = rotated
-
-    def rotate_cc(self):
-        """Rotates the Tetromino counterclockwise
-        """
-        rotated = [[] for _ in range(len(self.blocks))]
-        for x in range(len(self.blocks)):
-            for y in range(len(self.blocks)):
-                rotated[x].append(self.blocks[y][abs(x-(len(self.blocks)-1))])
-        self.blocks = rotated
+    Args:
+        surface (pygame surface): designates which pygame surface to draw
+            the Tetromino onto.
+        tetromino (Tetromino): The Tetromino to draw.
+        left (int): The x coordinate of the Tetromino's bounding box.
+        top (int): The y coordinate of the Tetromino's bounding box.
+    """
+    for x, y in tetromino.state.cells:
+        pygame.draw.rect(surface, tetromino.color, pygame.Rect(
+            left + GRID_SIZE * x,
+            top + GRID_SIZE * y,
+            GRID_SIZE,
+            GRID_SIZE
+        ))
 
-    def draw(self, surface):
-        """Draws the Tetromino onto the surface given.
 
-        Args:
-            surface (pygame surface): designates which pygame surface to draw
-            the Tetromino onto.
-        """
-        self.squares = []
-        for x in range(len(self.blocks)):
-            for y in range(len(self.blocks)):
-                if self.blocks[y][x]:
-                    self.squares.append(pygame.Rect(
-                        (self.bounding_box.left + GRID_SIZE * x),
-                        (self.bounding_box.top + GRID_SIZE * y),
-                        GRID_SIZE,
-                        GRID_SIZE
-                    ))
-        for square in self.squares:
-            pygame.draw.rect(surface, self.color, square)
-
-    def fall(self, level):
-        """Makes the Tetromino fall over time.
+def draw_score(score_area, game):
+    """Draws the current score and level into the score area.
 
-        Args:
-            level (int): The current level that the player is on,
-            based on the number of rows they have cleared. At higher levels,
-            the Tetrominos will fall faster.
-        """
-        if self.falling == True:
-            self.tick_count += (level / 2)
-            if self.tick_count > self.DROP_RATE:
-                self.bounding_box.top += GRID_SIZE
-                self.tick_count = 0
+    Args:
+        score_area (pygame surface): The surface used to display the current
+            score and level.
+        game (Game): The game being played.
+    """
+    score_area.fill(BANNER_COLOR)
+    score_text = render_text(f"Score: {game.score}", TEXT_COLOR, STAT_FONT)
+    level_text = render_text(f"Level: {game.level}", TEXT_COLOR, STAT_FONT)
+    score_area.blit(score_text, (10, 10))
+    score_area.blit(level_text, (10, SCORE_HEIGHT -
+                                 10 - level_text.get_height()))
 
-    def drop(self, placed_blocks):
-        """Drops the Tetromino much more quickly than normal.
 
-        Args:
-            placed_blocks (list): A list containing the pygame rectangles
-            for every block already placed on the level from pieces that
-            have already fallen and become fixed in place, but haven't been
-            cleared by completing a row.
-        """
-        self.DROP_RATE = 0.5
+def draw_next(next_piece, game):
+    """Draws the next Tetromino, centered, into the next piece area.
 
-    def shift(self, direction, placed_blocks):
-        """Shifts the Tetromino one column to the left or right.
+    Args:
+        next_piece (pygame surface): The surface used to display the next
+            Tetromino that will fall.
+        game (Game): The game being played.
+    """
+    draw_preview(next_piece, game.next)
 
-        Args:
-            direction (string): A string telling the function which direction
-            the user input specifies the Tetromino should move.
-            placed_blocks (list): A list containing the pygame rectangles
-            for every block already placed on the level from pieces that
-            have already fallen and become fixed in place, but haven't been
-            cleared by completing a row.
-        """
-        left_edge = PLAY_AREA_WIDTH
-        right_edge = 0
-        top = []
-        can_move = False
-        if not placed_blocks:
-            can_move = True
-        if direction == "left":
-            for square in self.squares:
-                if square.left < left_edge:
-                    left_edge = square.left
-                top.append(square.top)
-            try:
-                for block in placed_blocks:
-                    if block[0].right == left_edge and block[0].top in top:
-                        can_move = False
-                    elif left_edge < GRID_SIZE:
-                        can_move = False
-                    else:
-                        can_move = True
-            except:
-                pass
-            if can_move == True:
-                self.bounding_box.left -= GRID_SIZE
-
-        elif direction == "right":
-            for square in self.squares:
-                if square.right > right_edge:
-                    right_edge = square.right
-                top.append(square.top)
-            try:
-                for block in placed_blocks:
-                    if block[0].left == right_edge and block[0].top in top:
-                        can_move = False
-                    elif right_edge == PLAY_AREA_WIDTH:
-                        can_move = False
-                    else:
-                        can_move = True
-            except:
-                pass
-            if can_move == True:
-                self.bounding_box.left += GRID_SIZE
 
+def draw_preview(next_piece, tetromino):
+    """Draws a Tetromino, centered, onto a surface the size of the next piece
+    area.
 
-def draw_window(window, play_area, score_area, next_piece, tetrominos, next_tetromino, placed_blocks, score, level):
+    Args:
+        next_piece (pygame surface): The surface to draw onto.
+        tetromino (Tetromino): The Tetromino to draw. Only its shape and
+            rotation are used.
+    """
+    next_piece.fill(BANNER_COLOR)
+    preview_size = GRID_SIZE * tetromino.state.size
+    draw_tetromino(next_piece, tetromino,
+                   int(NEXT_PIECE_SIZE / 2 - preview_size / 2),
+                   int(NEXT_PIECE_SIZE / 2 - preview_size / 2))
+
+
+def draw_window(window, play_area, score_area, next_piece, game):
     """Draws the window in which the game displays.
 
     Args:
@@ -271,66 +173,469 @@ def draw_window(window, play_area, score_area, next_piece, tetrominos, next_tetr
             score and level.
         next_piece (pygame surface): The surface used to display the next
             Tetromino that will fall.
-        tetrominos (list): A list of Tetrominos currently in the "bag."
-            This list will repopulate once it only contains two items.
-        next_tetromino (Tetromino): A Tetromino object of the next Tetromino
-            that will fall.
-        placed_blocks (list): A list containing the pygame rectangles
-            for every block already placed on the level from pieces that
-            have already fallen and become fixed in place, but haven't been
-            cleared by completing a row.
-        score (int): The player's current score.
-        level (int): The level that the player is currently on.
+        game (Game): The game being played, which holds the board, the
+            bag of Tetrominos, the score and the level.
     """
-    window.fill(BACKGROUND_COLOR)
+    draw_background(window)
+
+    draw_next(next_piece, game)
+    window.blit(next_piece, NEXT_PIECE_POSITION)
+
+    draw_score(score_area, game)
+    window.blit(score_area, SCORE_POSITION)
 
+    size = cell_size(game.columns, game.rows)
+    play_area.fill(BANNER_COLOR)
+    for column, row in game.current.cells():
+        pygame.draw.rect(play_area, game.current.color, pygame.Rect(
+            column * size, row * size, size, size))
+    for column, row, color in game.board.blocks():
+        pygame.draw.rect(play_area, color, pygame.Rect(
+            column * size, row * size, size, size))
+    area = pygame.Rect(0, 0, game.columns * size, game.rows * size)
+    draw_grid(play_area.subsurface(area), size)
+    window.blit(play_area, board_position(game.columns, game.rows), area)
+    pygame.display.update()
+
+
+def cell_size(columns, rows):
+    """Finds the size the cells of a board are drawn at, so that the whole
+    board fits in the play area. Cells are never drawn larger than
+    GRID_SIZE.
+
+    Args:
+        columns (int): The number of columns of the board.
+        rows (int): The number of rows of the board.
+
+    Returns:
+        int: The width and height of a cell, in pixels.
+    """
+    return max(1, min(GRID_SIZE, PLAY_AREA_WIDTH // columns,
+                      PLAY_AREA_HEIGHT // rows))
+
+
+def board_position(columns, rows):
+    """Finds where a board is drawn in the window, centered in the play area.
+
+    Args:
+        columns (int): The number of columns of the board.
+        rows (int): The number of rows of the board.
+
+    Returns:
+        tuple: The x and y coordinates of the board's top left corner.
+    """
+    size = cell_size(columns, rows)
+    return (PLAY_AREA_POSITION[0] + (PLAY_AREA_WIDTH - columns * size) // 2,
+            PLAY_AREA_POSITION[1] + (PLAY_AREA_HEIGHT - rows * size) // 2)
+
+
+def draw_background(window):
+    """Fills the window and draws the borders around the play area, the
+    next piece area and the score area.
+
+    Args:
+        window (pygame surface): The window in which the game is being played.
+    """
+    window.fill(BACKGROUND_COLOR)
     next_border_rect = pygame.Rect(
         (PLAY_AREA_WIDTH + 65, 45), (NEXT_PIECE_SIZE + 10, NEXT_PIECE_SIZE + 10))
     pygame.draw.rect(window, TEXT_COLOR, next_border_rect)
-    window.blit(next_piece, (PLAY_AREA_WIDTH + 70, 50))
     score_border_rect = pygame.Rect(
         (PLAY_AREA_WIDTH + 35, 100 + NEXT_PIECE_SIZE), (SCORE_WIDTH + 10, SCORE_HEIGHT + 10))
     pygame.draw.rect(window, TEXT_COLOR, score_border_rect)
-    window.blit(score_area, (PLAY_AREA_WIDTH + 40, 105 + NEXT_PIECE_SIZE))
-
-    score_area.fill(BANNER_COLOR)
-    score_text = STAT_FONT.render(f"Score: {score}", 1, TEXT_COLOR)
-    level_text = STAT_FONT.render(f"Level: {level}", 1, TEXT_COLOR)
-    score_area.blit(score_text, (10, 10))
-    score_area.blit(level_text, (10, SCORE_HEIGHT -
-                                 10 - level_text.get_height()))
-
-    next_piece.fill(BANNER_COLOR)
-    next_tetromino[0].bounding_box.center = (90, 90)
-    next_tetromino[0].draw(next_piece)
-
     play_border_rect = pygame.Rect(
         (10, 10), (PLAY_AREA_WIDTH + 10, PLAY_AREA_HEIGHT + 10))
     pygame.draw.rect(window, TEXT_COLOR, play_border_rect)
-    window.blit(play_area, (15, 15))
-    play_area.fill(BANNER_COLOR)
-    tetrominos[0].draw(play_area)
 
-    for block in placed_blocks:
-        pygame.draw.rect(play_area, block[1], block[0])
-    draw_grid(play_area)
-    pygame.display.update()
 
+class Renderer:
+    """Class used to draw a Game into the window from frame to frame.
+
+    The board is drawn with every cell cell_size pixels wide, so boards of
+    any size fit the play area. The grid and the locked stack are kept on
+    their own pre-rendered surfaces. The grid never changes, and the stack
+    is only redrawn for the rows that changed when a Tetromino locks or rows
+    are cleared. Every block is blitted from a pre-rendered tile for its
+    color, in batches with Surface.blits. The rects of every row and cell,
+    in the play area and in the window, are made once up front, so the
+    only rects a frame creates are the ones Surface.blit returns when the
+    score or next piece is redrawn.
+
+    With dirty_rects turned on, only what changed since the last frame is
+    redrawn and passed to pygame.display.update: the cells the current
+    Tetromino left and entered, any rows of the board that changed, and the
+    score and next piece areas when their contents change. The first frame,
+    and the first frame after invalidate is called, redraw the full window.
+
+    Rows cleared by the game flash for LINE_CLEAR_FRAMES frames, fading
+    out, once line_clear is given the game's LineClear events.
+
+    If a profiler.Profiler is given, drawing and updating the display are
+    timed with it as the "draw" and "display" phases.
+    """
+
+    def __init__(self, window, columns=COLUMNS, rows=ROWS,
+                 dirty_rects=DIRTY_RECTS, profiler=None):
+        self.window = window
+        self.profiler = profiler
+        self.cell_size = cell_size(columns, rows)
+        self.width = columns * self.cell_size
+        self.height = rows * self.cell_size
+        self.position = board_position(columns, rows)
+        self.play_area = pygame.Surface((self.width, self.height))
+        self.score_area = pygame.Surface((SCORE_WIDTH, SCORE_HEIGHT))
+        self.dirty_rects = dirty_rects
+
+        self.previews = {}
+        for shape in SHAPES:
+            preview = pygame.Surface((NEXT_PIECE_SIZE, NEXT_PIECE_SIZE))
+            draw_preview(preview, Tetromino(shape))
+            self.previews[shape] = preview
+
+        self.tiles = {}
+        for color in COLORS:
+            tile = pygame.Surface((self.cell_size, self.cell_size))
+            tile.fill(color)
+            self.tiles[color] = tile
+        self.grid = pygame.Surface((self.width, self.height))
+        self.grid.fill(GRID_KEY_COLOR)
+        draw_grid(self.grid, self.cell_size)
+        self.grid.set_colorkey(GRID_KEY_COLOR)
+        self.stack = pygame.Surface((self.width, self.height))
+        self.flash = pygame.Surface((self.width, self.cell_size))
+        self.flash.fill(FLASH_COLOR)
+        self.flashes = {}
+        size = self.cell_size
+        self.full_area = self.area(0, 0, self.width, self.height)
+        self.row_areas = [self.area(0, row * size, self.width, size)
+                          for row in range(rows)]
+        self.cell_areas = [[self.area(column * size, row * size, size, size)
+                            for column in range(columns)]
+                           for row in range(rows)]
+        self.invalidate()
+
+    def area(self, left, top, width, height):
+        """Makes the rects of a part of the play area.
+
+        Args:
+            left (int): The left of the part, in the play area.
+            top (int): The top of the part, in the play area.
+            width (int): The width of the part.
+            height (int): The height of the part.
+
+        Returns:
+            tuple: The rect of the part in the play area, and in the window.
+        """
+        rect = pygame.Rect(left, top, width, height)
+        return rect, rect.move(self.position)
+
+    def invalidate(self):
+        """Forces the next frame to redraw the full window, for example after
+        the pause or game over screen has been drawn over it.
+        """
+        self.full_redraw = True
+        self.tetromino = None
+        self.piece_left = None
+        self.piece_top = None
+        self.piece_rotation = None
+        self.piece_cells = set()
+        self.masks = []
+        self.colors = b""
+        self.score = None
+        self.level = None
+        self.next_shape = None
+
+    def unchanged(self, game):
+        """Checks whether the game looks the same as it did in the last
+        frame. This is checked every frame, so it only compares values the
+        game and the renderer already hold, without building any new ones.
+        The rest of draw does allocate a little; see bench.py.
+
+        Args:
+            game (Game): The game being played.
+
+        Returns:
+            bool: True if nothing needs to be redrawn.
+        """
+        current = game.current
+        return (current is self.tetromino
+                and current.left == self.piece_left
+                and current.top == self.piece_top
+                and current.rotation == self.piece_rotation
+                and game.score == self.score
+                and game.level == self.level
+                and game.next.shape == self.next_shape
+                and game.board.masks == self.masks
+                and game.board.colors == self.colors
+                and not self.flashes)
+
+    def remember(self, game, piece_cells):
+        """Stores what was drawn this frame, to compare the next frame to.
+
+        Args:
+            game (Game): The game that was drawn.
+            piece_cells (set): The visible cells of the current Tetromino.
+        """
+        current = game.current
+        self.tetromino = current
+        self.piece_left = current.left
+        self.piece_top = current.top
+        self.piece_rotation = current.rotation
+        self.piece_cells = piece_cells
+        if game.board.masks != self.masks or game.board.colors != self.colors:
+            self.masks = list(game.board.masks)
+            self.colors = bytes(game.board.colors)
+        self.score = game.score
+        self.level = game.level
+        self.next_shape = game.next.shape
+
+    def visible_cells(self, tetromino):
+        """Returns the cells of a Tetromino that are inside the play area.
+
+        Args:
+            tetromino (Tetromino): The Tetromino to look at.
+
+        Returns:
+            set: (column, row) pairs of the visible squares.
+        """
+        return {(column, row) for column, row in tetromino.cells()
+                if row >= 0}
+
+    def changed_rows(self, board):
+        """Finds the rows of the board that differ from the last frame.
+
+        Args:
+            board (Board): The board being drawn.
+
+        Returns:
+            list: The indexes of the rows that changed.
+        """
+        if board.masks == self.masks and board.colors == self.colors:
+            return []
+        if len(self.masks) != board.rows:
+            return list(range(board.rows))
+        columns = board.columns
+        rows = []
+        for row in range(board.rows):
+            start = row * columns
+            if board.masks[row] != self.masks[row] or \
+                    board.colors[start:start + columns] != \
+                    self.colors[start:start + columns]:
+                rows.append(row)
+        return rows
+
+    def line_clear(self, event):
+        """Starts flashing the rows of a line clear. Meant to be added to
+        Game.listeners.
+
+        Args:
+            event (tuple): The game's event. Events other than LineClear
+                are ignored.
+        """
+        if isinstance(event, LineClear):
+            for row in event.rows:
+                self.flashes[row] = LINE_CLEAR_FRAMES
 
-def draw_grid(play_area):
+    def draw_flashes(self):
+        """Draws the flashing rows over the play area, more transparent the
+        fewer frames they have left.
+        """
+        for row, frames in self.flashes.items():
+            if frames:
+                self.flash.set_alpha(FLASH_ALPHA * frames // LINE_CLEAR_FRAMES)
+                self.play_area.blit(self.flash, (0, row * self.cell_size))
+
+    def age_flashes(self):
+        """Counts down the frames left for every flashing row. A row is
+        forgotten one frame after its count reaches zero, so that it is
+        drawn once more without the flash.
+        """
+        for row in list(self.flashes):
+            if self.flashes[row]:
+                self.flashes[row] -= 1
+            else:
+                del self.flashes[row]
+
+    def update_stack(self, board, rows):
+        """Redraws the given rows of the stack surface from the board.
+
+        Args:
+            board (Board): The board being drawn.
+            rows (list): The indexes of the rows to redraw.
+        """
+        size = self.cell_size
+        tiles = []
+        for row in rows:
+            self.stack.fill(BANNER_COLOR, (0, row * size, self.width, size))
+            mask = board.masks[row]
+            for column in range(board.columns):
+                if mask >> column & 1:
+                    tiles.append((self.tiles[board.color(column, row)],
+                                  (column * size, row * size)))
+        self.stack.blits(tiles, doreturn=False)
+
+    def compose(self, game, areas, piece_cells):
+        """Rebuilds parts of the play area from the stack, the current
+        Tetromino and the grid.
+
+        Args:
+            game (Game): The game being played.
+            areas (list): The parts of the play area to rebuild, from
+                row_areas, cell_areas or full_area.
+            piece_cells (set): The visible cells of the current Tetromino.
+        """
+        tile = self.tiles[game.current.color]
+        cell_areas = self.cell_areas
+        self.play_area.blits([(self.stack, area, area)
+                              for area, _ in areas], doreturn=False)
+        self.play_area.blits([(tile, cell_areas[row][column][0])
+                              for column, row in piece_cells],
+                             doreturn=False)
+        self.play_area.blits([(self.grid, area, area)
+                              for area, _ in areas], doreturn=False)
+
+    def draw(self, game):
+        """Draws the current frame of the game.
+
+        Args:
+            game (Game): The game being played.
+
+        Returns:
+            bool: True if anything was drawn and passed to the display, or
+                False if the frame looked the same as the last one.
+        """
+        board = game.board
+        if self.full_redraw or not self.dirty_rects:
+            piece_cells = self.visible_cells(game.current)
+            self.update_stack(board, self.changed_rows(board))
+            self.compose(game, [self.full_area], piece_cells)
+            self.draw_flashes()
+            self.age_flashes()
+            draw_background(self.window)
+            self.window.blit(self.previews[game.next.shape],
+                             NEXT_PIECE_POSITION)
+            draw_score(self.score_area, game)
+            self.window.blit(self.score_area, SCORE_POSITION)
+            self.window.blit(self.play_area, self.position)
+            self.mark("draw")
+            pygame.display.update()
+            self.mark("display")
+            self.remember(game, piece_cells)
+            self.full_redraw = False
+            return True
+        if self.unchanged(game):
+            return False
+
+        piece_cells = self.visible_cells(game.current)
+        if game.current is self.tetromino:
+            cells = piece_cells ^ self.piece_cells
+        else:
+            cells = piece_cells | self.piece_cells
+        rows = self.changed_rows(board)
+        self.update_stack(board, rows)
+        rows.extend(row for row in self.flashes if row not in rows)
+        areas = [self.row_areas[row] for row in rows]
+        areas.extend(self.cell_areas[row][column]
+                     for column, row in cells if row not in rows)
+        self.compose(game, areas, piece_cells)
+        self.draw_flashes()
+        self.age_flashes()
+        self.window.blits([(self.play_area, position, area)
+                           for area, position in areas], doreturn=False)
+        rects = [position for _, position in areas]
+
+        if game.score != self.score or game.level != self.level:
+            draw_score(self.score_area, game)
+            rects.append(self.window.blit(self.score_area, SCORE_POSITION))
+
+        if game.next.shape != self.next_shape:
+            rects.append(self.window.blit(self.previews[game.next.shape],
+                                          NEXT_PIECE_POSITION))
+
+        self.remember(game, piece_cells)
+        self.mark("draw")
+        if rects:
+            pygame.display.update(rects)
+        self.mark("display")
+        return bool(rects)
+
+    def mark(self, phase):
+        """Marks the end of a phase of drawing, if there is a profiler.
+
+        Args:
+            phase (string): The name of the phase.
+        """
+        if self.profiler is not None:
+            self.profiler.mark(phase)
+
+
+def draw_grid(play_area, size=GRID_SIZE):
     """Draws a grid onto the play area so the player can see the rows and 
-    columns that constrain the Tetrominos.
+    columns that constrain the Tetrominos. No grid is drawn when the cells
+    are smaller than GRID_LINE_MIN_SIZE, since the lines would hide them.
 
     Args:
         play_area (pygame surface): The play area in which falling Tetrominos
             and the already placed blocks are contained.
+        size (int): The width and height of a cell, in pixels.
+    """
+    if size < GRID_LINE_MIN_SIZE:
+        return
+    width, height = play_area.get_size()
+    for x in range(0, width, size):
+        pygame.draw.line(play_area, GRID_COLOR, (x, 0), (x, height), 1)
+    for y in range(0, height, size):
+        pygame.draw.line(play_area, GRID_COLOR, (0, y), (width, y), 1)
+
+
+def draw_profile(window, profiler, latency=None):
+    """Draws the 50th and 99th percentile of every phase of the recent
+    frames in a box next to the play area.
+
+    Args:
+        window (pygame surface): The window in which the game is being played.
+        profiler (Profiler): The profiler that timed the frames.
+        latency (LatencyMeter): If given, the input latency it measured is
+            drawn as well.
+
+    Returns:
+        pygame rect: The area of the window that was drawn over.
     """
-    for x in range(0, PLAY_AREA_WIDTH, GRID_SIZE):
-        pygame.draw.line(play_area, GRID_COLOR,
-                         (x, 0), (x, PLAY_AREA_HEIGHT), 1)
-    for y in range(0, PLAY_AREA_HEIGHT, GRID_SIZE):
-        pygame.draw.line(play_area, GRID_COLOR,
-                         (0, y), (PLAY_AREA_WIDTH, y), 1)
+    rect = pygame.Rect(PROFILE_POSITION, PROFILE_SIZE)
+    window.fill(PROFILE_COLOR, rect)
+    summary = profiler.summary()
+    if latency is not None:
+        summary["input lag"] = latency.summary()
+    lines = [("ms", "p50", "p99")]
+    lines += [(name, f"{p50:.2f}", f"{p99:.2f}")
+              for name, (p50, p99) in summary.items()]
+    for i, (name, p50, p99) in enumerate(lines):
+        top = rect.top + 6 + i * 20
+        window.blit(PROFILE_FONT.render(name, 1, PROFILE_TEXT_COLOR),
+                    (rect.left + 8, top))
+        # The numbers are right aligned, since the font isn't monospaced.
+        for text, right in ((p50, rect.right - 90), (p99, rect.right - 10)):
+            surface = PROFILE_FONT.render(text, 1, PROFILE_TEXT_COLOR)
+            window.blit(surface, (right - surface.get_width(), top))
+    return rect
+
+
+def save_profile(profiler, latency=None, directory=PROFILE_DIRECTORY):
+    """Writes the recent frames to a CSV file and a Chrome trace file, both
+    named after the current time, and the measured input latencies to
+    another CSV file.
+
+    Args:
+        profiler (Profiler): The profiler that timed the frames.
+        latency (LatencyMeter): The input latencies to write, if any.
+        directory (string): The directory to write the files to.
+    """
+    os.makedirs(directory, exist_ok=True)
+    name = os.path.join(directory, time.strftime("frames-%Y%m%d-%H%M%S"))
+    profiler.write_csv(name + ".csv")
+    profiler.write_trace(name + ".json")
+    if latency is not None and latency.latencies:
+        latency.write_csv(name + "-input.csv")
 
 
 def pause(window):
@@ -343,7 +648,7 @@ def pause(window):
     pause_surface = pygame.Surface(
         (PLAY_AREA_WIDTH, PLAY_AREA_HEIGHT), pygame.SRCALPHA)
     pause_surface.fill(PAUSE_COLOR)
-    pause_text = STAT_FONT.render("GAME PAUSED", 1, TEXT_COLOR)
+    pause_text = render_text("GAME PAUSED", TEXT_COLOR, STAT_FONT)
     pause_surface.blit(
         pause_text,
         (int(PLAY_AREA_WIDTH / 2 - pause_text.get_width() / 2),
@@ -352,13 +657,15 @@ def pause(window):
     window.blit(pause_surface, (15, 15))
     pygame.display.update()
     while paused:
-        for event in pygame.event.get():
-            if event.type == QUIT:
-                pygame.quit()
-                quit()
-            if event.type == KEYDOWN:
-                if event.key == K_ESCAPE or event.key == K_F1:
-                    paused = False
+        event = pygame.event.wait(IDLE_TIMEOUT)
+        if event.type == QUIT:
+            pygame.quit()
+            quit()
+        if event.type == WINDOWEXPOSED:
+            pygame.display.update()
+        if event.type == KEYDOWN:
+            if event.key == K_ESCAPE or event.key == K_F1:
+                paused = False
 
 
 def game_over(window):
@@ -376,7 +683,7 @@ def game_over(window):
     text = ["Game Over", "Press ESC or F1 to quit,",
             "or press any other key to play again."]
     for i, phrase in enumerate(text):
-        game_over_text = STAT_FONT.render(phrase, 1, TEXT_COLOR)
+        game_over_text = render_text(phrase, TEXT_COLOR, STAT_FONT)
         text_rect = game_over_text.get_rect()
         pygame.draw.rect(window, BACKGROUND_COLOR, text_rect)
         window.blit(
@@ -387,205 +694,244 @@ def game_over(window):
 
     pygame.display.update()
     while paused:
-        for event in pygame.event.get():
-            if event.type == QUIT:
+        event = pygame.event.wait(IDLE_TIMEOUT)
+        if event.type == QUIT:
+            pygame.quit()
+            quit()
+        if event.type == WINDOWEXPOSED:
+            pygame.display.update()
+        if event.type == KEYDOWN:
+            if event.key == K_ESCAPE or event.key == K_F1:
                 pygame.quit()
                 quit()
-            if event.type == KEYDOWN:
-                if event.key == K_ESCAPE or event.key == K_F1:
-                    pygame.quit()
-                    quit()
-                else:
-                    paused = False
+            else:
+                paused = False
+
+
+def idle():
+    """Sleeps while the window is minimized or out of focus, until it is
+    restored or focused again. The game is frozen in the meantime.
+    """
+    while not (pygame.key.get_focused() and pygame.display.get_active()):
+        event = pygame.event.wait(IDLE_TIMEOUT)
+        if event.type == QUIT:
+            pygame.quit()
+            quit()
 
 
-def check_lines(placed_blocks):
-    """Checks to see if the placed blocks create a full row.
+def wait_for_events(timestep):
+    """Sleeps until there is input to handle or the next tick is due, so the
+    main loop doesn't spin while nothing is happening.
 
     Args:
-        placed_blocks (list): A list containing the pygame rectangles
-            for every block already placed on the level from pieces that
-            have already fallen and become fixed in place, but haven't been
-            cleared by completing a row.
+        timestep (FixedTimestep): The scheduler that decides when the next
+            tick is due.
 
     Returns:
-        placed_blocks (list): A list containing the pygame rectangles
-            for every block already placed on the level from pieces that
-            have already fallen and become fixed in place, but haven't been
-            cleared by completing a row.
-        rows_cleared (int): The number of rows that were cleared during the
-            calling of this function.
+        list: Every event that arrived, in order.
     """
-    rows_cleared = 0
-    blocks_to_clear = []
-    blocks_to_move = []
-    for y in range(PLAY_AREA_HEIGHT, 0, -GRID_SIZE):
-        blocks_in_row = []
-        for x in range(0, PLAY_AREA_WIDTH, GRID_SIZE):
-            for block in placed_blocks:
-                if block[0].left == x and block[0].bottom == y:
-                    blocks_in_row.append(block)
-        if len(blocks_in_row) == PLAY_AREA_WIDTH / GRID_SIZE:
-            for block in blocks_in_row:
-                blocks_to_clear.append(block)
-            for block in placed_blocks:
-                if block[0].bottom <= y:
-                    blocks_to_move.append(block)
-            rows_cleared += 1
-    for block in blocks_to_clear:
-        placed_blocks.remove(block)
-    for block in blocks_to_move:
-        block[0].bottom += GRID_SIZE
-    return placed_blocks, rows_cleared
-
-
-def get_score(rows_cleared, level):
-    """Returns a value to add to the score after a row has been cleared.
+    events = pygame.event.get()
+    if events:
+        return events
+    delay = int(timestep.time_to_next_tick * 1000)
+    if delay > 0:
+        event = pygame.event.wait(delay)
+        if event.type != NOEVENT:
+            events.append(event)
+            events.extend(pygame.event.get())
+    return events
+
+
+def start_bot():
+    """Starts the bot that plays when autoplay is on. bot.py is imported
+    here rather than at startup, since most games never use it.
+
+    Returns:
+        Bot: The bot.
+    """
+    from bot import Bot
+    return Bot()
+
+
+def start_analytics(game):
+    """Starts streaming a game's events to ANALYTICS_PATH. analytics.py is
+    imported here rather than at startup, since it is off by default.
 
     Args:
-        rows_cleared (int): The number of rows cleared the last time the
-            check_lines function was called.
-        level (int): The player's current level.
+        game (Game): The game to record. It is reset with the same seed, so
+            it must not have started yet.
 
     Returns:
-        int: A number of points to be added to the score based on the
-            number of rows cleared and the current level.
+        Analytics: The analytics, which write their last events when the
+            game exits.
     """
-    if rows_cleared == 0:
-        return 0
-    elif rows_cleared == 1:
-        return 100 * level
-    elif rows_cleared == 2:
-        return 300 * level
-    elif rows_cleared == 3:
-        return 500 * level
-    elif rows_cleared == 4:
-        return 800 * level
+    from analytics import Analytics, open_writer
+    analytics = Analytics(open_writer(ANALYTICS_PATH))
+    analytics.attach(game)
+    # Starts the same game over, so its first Tetromino is recorded.
+    game.reset(game.seed)
+    atexit.register(analytics.close)
+    return analytics
 
 
-def main():
-    """The main game loop function.
+def startup():
+    """Initializes the parts of pygame the game uses, the display and the
+    fonts, and opens the window. Nothing else, such as audio or joysticks,
+    is started, and the font is loaded from FONT_PATH instead of being
+    looked up among the system fonts.
+
+    Returns:
+        pygame surface: The window in which the game is played.
     """
+    global STAT_FONT, PROFILE_FONT
+    pygame.display.init()
+    pygame.font.init()
+    STAT_FONT = pygame.font.Font(FONT_PATH, STAT_FONT_SIZE)
+    PROFILE_FONT = pygame.font.Font(FONT_PATH, PROFILE_FONT_SIZE)
     window = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
     pygame.display.set_caption("Tetros")
-    play_area = pygame.Surface((PLAY_AREA_WIDTH, PLAY_AREA_HEIGHT))
-    score_area = pygame.Surface((SCORE_WIDTH, SCORE_HEIGHT))
-    next_piece = pygame.Surface((NEXT_PIECE_SIZE, NEXT_PIECE_SIZE))
+    pygame.event.set_blocked(None)
+    pygame.event.set_allowed(HANDLED_EVENTS)
+    return window
 
-    clock = pygame.time.Clock()
-    score = 0
-    level_progress = 0
-    level = 1
-    tetrominos = []
-    placed_blocks = []
 
-    restart_game = False
-    run = True
+def report_first_frame():
+    """Prints how long it took from starting to import this module until
+    the first frame was on screen, for tracking startup time.
 
-    while run:
-        clock.tick(30)
+    Returns:
+        float: The time to the first frame, in milliseconds.
+    """
+    elapsed = (time.perf_counter() - STARTED_AT) * 1000
+    print(f"Time to first frame: {elapsed:.1f} ms", file=sys.stderr)
+    return elapsed
+
+
+def main():
+    """The main game loop function.
+    """
+    window = startup()
+    profiler = Profiler()
+    latency = LatencyMeter()
+    autoshift = AutoShift()
+    renderer = Renderer(window, BOARD_COLUMNS, BOARD_ROWS, profiler=profiler)
 
-        if len(tetrominos) < 2:
-            shapes = list(SHAPES)
-            random.shuffle(shapes)
-            for shape in shapes:
-                tetrominos.append(Tetromino(shape))
+    clock = pygame.time.Clock()
+    timestep = FixedTimestep()
+    game = Game(BOARD_COLUMNS, BOARD_ROWS)
+    game.profiler = profiler
+    game.listeners.append(renderer.line_clear)
+    if REPLAY_DIRECTORY:
+        os.makedirs(REPLAY_DIRECTORY, exist_ok=True)
+        record(game)
+    if ANALYTICS_PATH:
+        start_analytics(game)
+    bot = start_bot() if AUTOPLAY else None
+    renderer.draw(game)
+    report_first_frame()
+    run = True
 
-        tetrominos[0].fall(level)
-        next_tetromino = [tetrominos[1].deepcopy()]
-        draw_window(window, play_area, score_area, next_piece,
-                    tetrominos, next_tetromino, placed_blocks, score, level)
+    while run:
+        clock.tick(FRAME_RATE)
 
-        for event in pygame.event.get():
+        events = wait_for_events(timestep)
+        profiler.start_frame()
+        for event in events:
             if event.type == QUIT:
                 run = False
                 pygame.quit()
                 quit()
+            if event.type in (WINDOWFOCUSLOST, WINDOWMINIMIZED):
+                idle()
+                renderer.invalidate()
+                timestep.reset()
+                autoshift.reset()
+                profiler.start_frame()
+            if event.type == WINDOWEXPOSED:
+                renderer.invalidate()
             if event.type == KEYDOWN:
-                if event.key in [K_UP, K_x, K_KP1, K_KP5, K_KP9]:
-                    tetrominos[0].rotate()
-                if event.key in [K_z, K_LCTRL, K_RCTRL, K_KP3, K_KP7]:
-                    tetrominos[0].rotate_cc()
-                if event.key in [K_SPACE, K_DOWN, K_KP2, K_KP8]:
-                    tetrominos[0].drop(placed_blocks)
-                if event.key in [K_LSHIFT, K_RSHIFT, K_c, K_KP0]:
-                    tetrominos[0].falling = False
-                if event.key in [K_ESCAPE, K_F1]:
+                if event.key in GAMEPLAY_KEYS:
+                    latency.press()
+                if event.key in ROTATE_KEYS:
+                    game.rotate()
+                if event.key in ROTATE_CC_KEYS:
+                    game.rotate_cc()
+                if event.key in DROP_KEYS:
+                    game.drop()
+                if event.key in HARD_DROP_KEYS:
+                    game.hard_drop()
+                if event.key in FREEZE_KEYS:
+                    game.set_falling(False)
+                if event.key in PAUSE_KEYS:
                     pause(window)
-                if event.key in [K_LEFT, K_KP4]:
-                    tetrominos[0].shift("left", placed_blocks)
-                if event.key in [K_RIGHT, K_KP6]:
-                    tetrominos[0].shift("right", placed_blocks)
+                    renderer.invalidate()
+                    timestep.reset()
+                    autoshift.reset()
+                    profiler.start_frame()
+                if event.key in LEFT_KEYS:
+                    game.shift("left")
+                    autoshift.press(LEFT)
+                if event.key in RIGHT_KEYS:
+                    game.shift("right")
+                    autoshift.press(RIGHT)
+                if event.key == K_F2:
+                    if bot is None:
+                        bot = start_bot()
+                    else:
+                        bot.close()
+                        bot = None
+                if event.key == K_F3:
+                    profiler.enabled = not profiler.enabled
+                    profiler.clear()
+                    profiler.start_frame()
+                    renderer.invalidate()
+                if event.key == K_F4 and profiler.count:
+                    save_profile(profiler, latency)
 
             if event.type == KEYUP:
-                if event.key in [K_LSHIFT, K_RSHIFT, K_c, K_KP0]:
-                    tetrominos[0].falling = True
-
-        for square in tetrominos[0].squares:
-            if square.left < 0:
-                tetrominos[0].bounding_box.left += GRID_SIZE
-            elif square.right > PLAY_AREA_WIDTH:
-                tetrominos[0].bounding_box.right -= GRID_SIZE
-
-        if placed_blocks:
-            for block in placed_blocks:
-                try:
-                    for square in tetrominos[0].squares:
-                        if square.bottom == block[0].top and square.left == block[0].left:
-                            for x in range(len(tetrominos[0].blocks)):
-                                for y in range(len(tetrominos[0].blocks)):
-                                    if tetrominos[0].blocks[y][x]:
-                                        placed_blocks.append((pygame.Rect(
-                                            (tetrominos[0].bounding_box.left +
-                                             GRID_SIZE * x),
-                                            (tetrominos[0].bounding_box.top +
-                                             GRID_SIZE * y),
-                                            GRID_SIZE,
-                                            GRID_SIZE
-                                        ), tetrominos[0].color))
-                            tetrominos.pop(0)
-                            break
-                except:
-                    pass
-                if block[0].top < 0:
-                    game_over(window)
-                    restart_game = True
-                    break
-
-        if restart_game == True:
-            score = 0
-            level = 1
-            tetrominos = []
-            placed_blocks = []
-            restart_game = False
-            continue
-
-        try:
-            for square in tetrominos[0].squares:
-                if square.bottom == PLAY_AREA_HEIGHT:
-                    for x in range(len(tetrominos[0].blocks)):
-                        for y in range(len(tetrominos[0].blocks)):
-                            if tetrominos[0].blocks[y][x]:
-                                placed_blocks.append((pygame.Rect(
-                                    (tetrominos[0].bounding_box.left +
-                                     GRID_SIZE * x),
-                                    (tetrominos[0].bounding_box.top +
-                                     GRID_SIZE * y),
-                                    GRID_SIZE,
-                                    GRID_SIZE
-                                ), tetrominos[0].color))
-                    tetrominos.pop(0)
-                    break
-        except:
+                if event.key in FREEZE_KEYS:
+                    game.set_falling(True)
+                if event.key in LEFT_KEYS:
+                    autoshift.release(LEFT)
+                if event.key in RIGHT_KEYS:
+                    autoshift.release(RIGHT)
+
+        profiler.mark("events")
+        for _ in range(timestep.advance()):
+            # Held keys are sampled right before every tick, so auto-shift
+            # is timed by the tick rate rather than the frame rate.
+            for _ in range(autoshift.update(game.columns)):
+                game.apply(autoshift.direction)
+            if bot is not None:
+                bot.play(game)
+                profiler.mark("bot")
+            game.tick()
+            if game.over:
+                break
+        if game.over:
+            if REPLAY_DIRECTORY:
+                Replay.from_game(game).save(os.path.join(
+                    REPLAY_DIRECTORY, f"{game.seed:016x}.replay"))
+            game_over(window)
+            game.reset()
+            renderer.invalidate()
+            timestep.reset()
+            autoshift.reset()
             continue
 
-        placed_blocks, rows_cleared = check_lines(placed_blocks)
-        score += get_score(rows_cleared, level)
-        level_progress += rows_cleared
-
-        if level_progress == 10:
-            level_progress = 0
-            level += 1
+        redrawn = renderer.full_redraw
+        # Key presses are handled before the frame is drawn, so the frame
+        # either shows them or shows that they changed nothing, such as a
+        # shift into a wall. Those are dropped rather than timed until
+        # something else happens to change the screen.
+        if renderer.draw(game):
+            latency.displayed()
+        else:
+            latency.skipped()
+        if profiler.enabled and (
+                redrawn or profiler.count % PROFILE_REFRESH_FRAMES == 0):
+            pygame.display.update(draw_profile(window, profiler, latency))
+        profiler.end_frame()
 
 
 if __name__ == "__main__":